@@ -1,9 +1,89 @@
 #!/usr/bin/env python
 
+import threading
+import time
+
+import bitboard
+
+# the eight directions to look for discs to flip in
+DIRECTIONS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+UNDO_SIZE = 128 # more than the moves in a game
+
 class AI(object):
 	def __init__(self, me):
 		self.me = me
 		self.opp = 1 if me == 2 else 2
+		self.bitboard = False
+
+		# undo stack for makeMove / unmakeMove: square played and mask of flipped squares, with undoTop entries in use
+		self.undoSquares = [0] * UNDO_SIZE
+		self.undoFlipped = [0] * UNDO_SIZE
+		self.undoTop = 0
+
+		# searches stop once clock() passes the deadline (None for no limit); see startPondering
+		self.deadline = None
+		self.clock = time.clock
+		self.ponderThread = None
+
+	# switch between the list-of-lists board (default) and the bitboard backend
+	# with the bitboard backend, states are bitboard.fromState() boards; move() converts at the boundary
+	def useBitboard(self, enabled):
+		self.bitboard = enabled
+		if enabled:
+			self.checkDirection = self.bitboardCheckDirection
+			self.isValid = self.bitboardIsValid
+			self.getValidMoves = self.bitboardGetValidMoves
+			self.simMove = self.bitboardSimMove
+			self.simMoveInPlace = self.bitboardSimMoveInPlace
+			self.makeMove = self.bitboardMakeMove
+			self.unmakeMove = self.bitboardUnmakeMove
+			self.restoreState = self.bitboardRestoreState
+			self.countScore = self.bitboardCountScore
+			self.fromState = bitboard.fromState
+			self.toState = bitboard.toState
+
+	# think about a position on the opponent's time, in a background thread, until stopPondering()
+	# the client only ponders while it waits on the server, so the thread never runs alongside move()
+	def startPondering(self, state, round):
+		# set here rather than in the thread, so a stop that comes before the thread gets going still counts
+		self.deadline = float('inf')
+		self.clock = time.time
+		self.ponderThread = threading.Thread(target=self.ponder, args=(state, round))
+		self.ponderThread.daemon = True
+		self.ponderThread.start()
+
+	# stop the ponder thread and wait for it, which is on our own clock once the opponent has moved: ponder() must
+	# check the deadline every few milliseconds (SmartAI by time, see checkDeadline; NewAI every playout)
+	def stopPondering(self):
+		if self.ponderThread is None:
+			return
+		self.deadline = -float('inf')
+		self.ponderThread.join()
+		self.ponderThread = None
+		self.deadline = None
+
+	# think about state (where the opponent is to move in the given round) until the deadline passes,
+	# noticing it promptly (see stopPondering); keeps whatever helps the next move() on this AI; does nothing by default
+	def ponder(self, state, round):
+		pass
+
+	# convert the list-of-lists state from the client into this AI's board representation (always a copy)
+	def fromState(self, state):
+		return [row[:] for row in state]
+
+	# convert this AI's board representation back into a list-of-lists state
+	def toState(self, state):
+		return state
+
+	# count the squares held by a player
+	def countScore(self, state, player):
+		score = 0
+		for row in state:
+			for slot in row:
+				if slot == player:
+					score += 1
+		return score
 
 	# check if player can play on a square based on given direction (combination of dx and dy)
 	def checkDirection(self, state, row, col, dx, dy, player):
@@ -60,29 +140,115 @@ class AI(object):
 		return self.simMoveInPlace(newState, round, player, row, col)
 
 	def simMoveInPlace(self, state, round, player, row, col):
+		self.flipInPlace(state, player, row, col)
+		return state
+
+	# make a move in place and return the mask of flipped squares (bit row*8 + col, as in bitboard)
+	def flipInPlace(self, state, player, row, col):
+		opp = 3-player
+		flipped = 0
 		# in each direction...
-		for dx in range(-1, 2):
-			for dy in range(-1, 2):
-				if ((dx == 0) and (dy == 0)):
-					continue
+		for (dx, dy) in DIRECTIONS:
+			# skip over the opponents...
+			r = row+dx
+			c = col+dy
+			while r >= 0 and r < 8 and c >= 0 and c < 8 and state[r][c] == opp:
+				r += dx
+				c += dy
 
-				# we flip all the opponents we find, if we find our existing piece
-				toFlip = []
-				r = row+dx
-				c = col+dy
-				while r >= 0 and r < 8 and c >= 0 and c < 8:
-					if state[r][c] == 0:
-						break
-					elif state[r][c] == player:
-						for square in toFlip:
-							state[square[0]][square[1]] = player
-						break
-					else:
-						toFlip.append([r, c])
-						r += dx
-						c += dy
+			# ...and if we find our existing piece, walk back flipping them all
+			if r >= 0 and r < 8 and c >= 0 and c < 8 and state[r][c] == player:
+				r -= dx
+				c -= dy
+				while r != row or c != col:
+					state[r][c] = player
+					flipped |= 1 << (r*8 + c)
+					r -= dx
+					c -= dy
 
 		# also give us our new piece
 		state[row][col] = player
 
+		return flipped
+
+	# make a move in place, remembering it on the undo stack; returns the mask of flipped squares
+	def makeMove(self, state, round, player, row, col):
+		flipped = self.flipInPlace(state, player, row, col)
+		self.undoSquares[self.undoTop] = row*8 + col
+		self.undoFlipped[self.undoTop] = flipped
+		self.undoTop += 1
+		return flipped
+
+	# take back the last move made with makeMove
+	def unmakeMove(self, state):
+		self.undoTop -= 1
+		sq = self.undoSquares[self.undoTop]
+		flipped = self.undoFlipped[self.undoTop]
+		player = state[sq >> 3][sq & 7]
+		state[sq >> 3][sq & 7] = 0
+		for sq in bitboard.squares(flipped):
+			state[sq >> 3][sq & 7] = 3-player
+
+	# overwrite state with the position in saved, without allocating a new board
+	def restoreState(self, state, saved):
+		for i in range(8):
+			state[i][:] = saved[i]
+
+	# take back moves until the undo stack is back to mark (a previous undoTop)
+	def unmakeTo(self, state, mark):
+		while self.undoTop > mark:
+			self.unmakeMove(state)
+
+	# bitboard versions of the above
+
+	def bitboardCheckDirection(self, state, row, col, dx, dy, player):
+		s, mask = bitboard.DIRECTIONS[(dx, dy)]
+		me = state[player]
+		opp = state[3-player]
+		x = bitboard.shift(1 << bitboard.square(row, col), s, mask)
+		if not x & opp:
+			return False
+		while x & opp:
+			x = bitboard.shift(x, s, mask)
+		return bool(x & me)
+
+	def bitboardIsValid(self, state, row, col, player):
+		return bool(bitboard.moveMask(state[player], state[3-player]) & (1 << bitboard.square(row, col)))
+
+	def bitboardGetValidMoves(self, state, round, player):
+		return bitboard.moveList(bitboard.validMask(state[player], state[3-player], round))
+
+	def bitboardSimMove(self, state, round, player, row, col):
+		return self.bitboardSimMoveInPlace(list(state), round, player, row, col)
+
+	def bitboardSimMoveInPlace(self, state, round, player, row, col):
+		sq = bitboard.square(row, col)
+		flipped = bitboard.flips(state[player], state[3-player], sq)
+		state[player] |= flipped | (1 << sq)
+		state[3-player] &= ~flipped
 		return state
+
+	def bitboardMakeMove(self, state, round, player, row, col):
+		sq = row*8 + col
+		flipped = bitboard.flips(state[player], state[3-player], sq)
+		state[player] |= flipped | (1 << sq)
+		state[3-player] &= ~flipped
+		self.undoSquares[self.undoTop] = sq
+		self.undoFlipped[self.undoTop] = flipped
+		self.undoTop += 1
+		return flipped
+
+	def bitboardUnmakeMove(self, state):
+		self.undoTop -= 1
+		bit = 1 << self.undoSquares[self.undoTop]
+		flipped = self.undoFlipped[self.undoTop]
+		player = 1 if state[1] & bit else 2
+		state[player] &= ~(flipped | bit)
+		state[3-player] |= flipped
+
+	def bitboardRestoreState(self, state, saved):
+		state[1] = saved[1]
+		state[2] = saved[2]
+
+	def bitboardCountScore(self, state, player):
+		return bitboard.popcount(state[player])
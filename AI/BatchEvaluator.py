@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+
+import numpy
+
+import bitboard
+import stability
+
+TOTAL_MOVES = 64
+
+# numpy only shifts uint64 arrays by uint64 amounts, so every constant is a uint64
+U = numpy.uint64
+FULL = U(bitboard.FULL)
+INNER = U(0x7E7E7E7E7E7E7E7E)
+CENTER = U(bitboard.CENTER)
+SHIFTS = dict([(s, U(s)) for s in (1, 2, 4, 7, 8, 9, 14, 16, 18, 28, 32, 36, 56)])
+LEFT_SHIFTS = [(SHIFTS[s], U(mask)) for (s, mask) in bitboard.LEFT_SHIFTS]
+RIGHT_SHIFTS = [(SHIFTS[s], U(mask)) for (s, mask) in bitboard.RIGHT_SHIFTS]
+
+# the bits of every byte value, for unpacking a row of a bitboard, and their count
+BYTE_BITS = numpy.array([[(byte >> col) & 1 for col in range(8)] for byte in range(256)], dtype=numpy.int64)
+BYTE_COUNT = BYTE_BITS.sum(axis=1)
+
+# the 8 row bytes of each board (byte 0 is row 0)
+def rows(b):
+	return b.astype('<u8').view(numpy.uint8).reshape(-1, 8)
+
+def popcount(b):
+	return BYTE_COUNT[rows(b)].sum(axis=1)
+
+# boards as a (boards, 64) array of 0/1, indexed by square
+def unpack(b):
+	return BYTE_BITS[rows(b)].reshape(-1, 64)
+
+# the functions below are the bitboard module's, on arrays of boards
+
+def neighbours(b):
+	result = numpy.zeros_like(b)
+	for (s, mask) in LEFT_SHIFTS:
+		result |= (b << s) & mask
+	for (s, mask) in RIGHT_SHIFTS:
+		result |= (b >> s) & mask
+	return result
+
+def moveMask(me, opp):
+	empty = ~(me | opp)
+	moves = numpy.zeros_like(me)
+	for (s, o) in [(1, opp & INNER), (8, opp), (9, opp & INNER), (7, opp & INNER)]:
+		s1 = SHIFTS[s]
+		s2 = SHIFTS[2*s]
+		t = o & (me << s1); t |= o & (t << s1); p = o & (o << s1); t |= p & (t << s2); t |= p & (t << s2)
+		moves |= t << s1
+		t = o & (me >> s1); t |= o & (t >> s1); p = o & (o >> s1); t |= p & (t >> s2); t |= p & (t >> s2)
+		moves |= t >> s1
+	return moves & empty
+
+def shift(b, s, mask):
+	if s > 0:
+		return (b << SHIFTS[s]) & U(mask)
+	return (b >> SHIFTS[-s]) & U(mask)
+
+# the discs flipped when me takes the square of each board's one bit move
+def flips(me, opp, move):
+	flipped = numpy.zeros_like(me)
+	zero = U(0)
+	for (s, mask) in bitboard.DIRECTIONS.values():
+		t = shift(move, s, mask) & opp
+		for i in range(5):
+			t |= shift(t, s, mask) & opp
+		flipped |= numpy.where(shift(t, s, mask) & me != zero, t, zero)
+	return flipped
+
+def fill(gen, pro, s):
+	if s > 0:
+		(s1, s2, s4) = (SHIFTS[s], SHIFTS[2*s], SHIFTS[4*s])
+		gen |= pro & (gen << s1)
+		pro &= pro << s1
+		gen |= pro & (gen << s2)
+		pro &= pro << s2
+		return gen | (pro & (gen << s4))
+	(s1, s2, s4) = (SHIFTS[-s], SHIFTS[-2*s], SHIFTS[-4*s])
+	gen |= pro & (gen >> s1)
+	pro &= pro >> s1
+	gen |= pro & (gen >> s2)
+	pro &= pro >> s2
+	return gen | (pro & (gen >> s4))
+
+def runToWall(b, dx, dy):
+	s, mask = bitboard.DIRECTIONS[(-dx, -dy)]
+	return fill(b & U(bitboard.WALLS[(dx, dy)]), b & U(mask), s)
+
+# the functions below are the stability module's, on arrays of boards
+
+EDGE = numpy.array(stability.EDGE, dtype=numpy.uint64)
+COLUMN = numpy.array(stability.COLUMN, dtype=numpy.uint64)
+
+def columnByte(b):
+	return ((b & U(stability.COL_0)) * U(stability.COLUMN_MAGIC)) >> SHIFTS[56]
+
+def edges(a, b):
+	(ra, rb) = (rows(a).astype(numpy.int64), rows(b).astype(numpy.int64))
+	result = EDGE[ra[:, 0] | (rb[:, 0] << 8)] | (EDGE[ra[:, 7] | (rb[:, 7] << 8)] << SHIFTS[56])
+	result |= COLUMN[EDGE[(columnByte(a) | (columnByte(b) << SHIFTS[8])).astype(numpy.int64)]]
+	result |= COLUMN[EDGE[(columnByte(a >> SHIFTS[7]) | (columnByte(b >> SHIFTS[7]) << SHIFTS[8])).astype(numpy.int64)]] << SHIFTS[7]
+	return result
+
+# every board is expanded until none has any new stable discs, which gives each the same discs as on its own
+def expand(own, stable, full):
+	stable = stable & own
+	candidates = own & ~stable
+	while candidates.any():
+		new = candidates
+		for i in range(4):
+			((s1, mask1), (s2, mask2), walls) = stability.ANCHORS[i]
+			new = new & (full[i] | U(walls) | shift(stable, s1, mask1) | shift(stable, s2, mask2))
+		if not new.any():
+			break
+		stable = stable | new
+		candidates = candidates ^ new
+	return stable
+
+def stable(a, b):
+	filled = a | b
+	full = [runToWall(filled, dx, dy) & runToWall(filled, -dx, -dy) for (dx, dy) in bitboard.AXES]
+	seeds = edges(a, b)
+	return expand(a, seeds, full) | expand(b, seeds, full)
+
+# 2.0 * (float(a) / (a + b) - 0.5), or 0 where a + b == 0, as in SmartAI.weigh
+def ratio(a, b):
+	total = a + b
+	return numpy.where(total == 0, 0.0, 2.0 * (a.astype(numpy.float64) / numpy.where(total == 0, 1, total) - 0.5))
+
+# SmartAI.bitboardHeuristic for many positions at once
+# the terms are computed with the same integer counts and the same floating point operations in the same order,
+# so every score is identical to the scalar one
+class BatchEvaluator(object):
+	def __init__(self, ai):
+		self.ai = ai
+		# which class each square belongs to, as a (64, classes) 0/1 matrix
+		self.classMatrix = numpy.array([[(mask >> sq) & 1 for mask in ai.classMasks] for sq in range(64)], dtype=numpy.int64)
+		self.squareValues = numpy.array(ai.squareValues, dtype=numpy.float64)
+
+	# score sibling leaves: mine and theirs are lists (or uint64 arrays) of bitboards of my and the opponent's discs,
+	# squares the square each was reached by; round and max are the leaves' (the same for all siblings)
+	def evaluate(self, mine, theirs, round, max, squares):
+		ai = self.ai
+		mine = numpy.array(mine, dtype=numpy.uint64)
+		theirs = numpy.array(theirs, dtype=numpy.uint64)
+
+		pivotTurn = 10
+		if TOTAL_MOVES - round < pivotTurn:
+			myScore = popcount(mine)
+			oppScore = popcount(theirs)
+			return 2.0 * (myScore.astype(numpy.float64) / (myScore + oppScore) - 0.5)
+
+		# positional: per class counts, then the class values in order
+		counts = (unpack(mine) - unpack(theirs)).dot(self.classMatrix)
+		positionalScore = numpy.zeros(len(mine))
+		for i in range(len(ai.classValues)):
+			positionalScore += counts[:, i] * ai.classValues[i]
+		if max:
+			positionalScore += self.squareValues[squares]
+		else:
+			positionalScore -= self.squareValues[squares]
+
+		empty = ~(mine | theirs)
+		open = neighbours(empty)
+		frontierScore = ratio(popcount(theirs & open), popcount(mine & open))
+
+		if round < 4:
+			myMoves = CENTER & empty
+			oppMoves = myMoves
+		else:
+			myMoves = moveMask(mine, theirs)
+			oppMoves = moveMask(theirs, mine)
+		mobilityScore = ratio(popcount(myMoves), popcount(oppMoves))
+
+		discs = stable(mine, theirs)
+		stabilityScore = ratio(popcount(discs & mine), popcount(discs & theirs))
+
+		positionalWeight = ai.config['positionalWeight']
+		frontierWeight = ai.config['frontierWeight']
+		mobilityWeight = ai.config['mobilityWeight']
+		stabilityWeight = ai.config['stabilityWeight']
+
+		score = \
+			positionalScore * positionalWeight + \
+			frontierScore * frontierWeight + \
+			mobilityScore * mobilityWeight + \
+			stabilityScore * stabilityWeight
+
+		score /= (positionalWeight + frontierWeight + mobilityWeight + stabilityWeight)
+
+		return score
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+import random
+
+import numpy
+
+from BatchEvaluator import U, CENTER, popcount, unpack, moveMask, flips
+import bitboard
+
+# random playouts for NewAI, many at once: the games are stacked into arrays of bitboards and all make their
+# moves together, one ply at a time, so a ply of thousands of games costs about as much python as a ply of one
+# moves are picked uniformly at random (without NewAI.simulate's occasional heuristic moves), and a game is
+# won by the player with more discs when neither player can move
+
+# a numpy random generator seeded from random, so that seeding random (as NewAI and its workers do) seeds the playouts
+def randomState():
+	return numpy.random.RandomState(random.getrandbits(32))
+
+# play out games random games after each of player's moves squares (square indices) from a bitboard board at round,
+# using the numpy random generator rng; returns (wins, draws, losses) for player for each move
+def playouts(board, round, player, squares, games, rng):
+	# every game, as the discs of the player to move and of the other player, and whether the player to move is player
+	# the game for squares[i] is in rows i*games to (i+1)*games - 1
+	toMove = []
+	other = []
+	for sq in squares:
+		flipped = bitboard.flips(board[player], board[3-player], sq)
+		other.append(board[player] | flipped | (1 << sq))
+		toMove.append(board[3-player] & ~flipped)
+	a = numpy.repeat(numpy.array(toMove, dtype=numpy.uint64), games)
+	b = numpy.repeat(numpy.array(other, dtype=numpy.uint64), games)
+	mine = numpy.zeros(len(a), dtype=bool)
+	round += 1
+
+	# the games still being played, by row, and each finished game's disc difference for player
+	live = numpy.arange(len(a))
+	results = numpy.zeros(len(a), dtype=numpy.int64)
+	while len(live) > 0:
+		# no game can pass until the center is filled, so while round < 4 every game is at round
+		if round < 4:
+			moves = CENTER & ~(a | b)
+		else:
+			moves = moveMask(a, b)
+
+		stuck = moves == U(0)
+		if stuck.any():
+			# the player to move passes, and the game is over if the other player cannot move either
+			replies = moveMask(b[stuck], a[stuck])
+			over = stuck.copy()
+			over[stuck] = replies == U(0)
+			passing = stuck & ~over
+			(a[passing], b[passing]) = (b[passing], a[passing])
+			mine[passing] = ~mine[passing]
+			moves[passing] = replies[replies != U(0)]
+			if over.any():
+				difference = popcount(a[over]) - popcount(b[over])
+				results[live[over]] = numpy.where(mine[over], difference, -difference)
+				going = ~over
+				(a, b, mine, moves, live) = (a[going], b[going], mine[going], moves[going], live[going])
+				if len(live) == 0:
+					break
+
+		# each game's move: the k-th of its moves, for a random k
+		bits = unpack(moves)
+		count = bits.sum(axis=1)
+		k = (rng.random_sample(len(live)) * count).astype(numpy.int64)
+		square = (bits.cumsum(axis=1) > k[:, None]).argmax(axis=1)
+		move = U(1) << square.astype(numpy.uint64)
+
+		flipped = flips(a, b, move)
+		(a, b) = (b & ~flipped, a | flipped | move)
+		mine = ~mine
+		round += 1
+
+	results = results.reshape(len(squares), games)
+	return [(int((r > 0).sum()), int((r == 0).sum()), int((r < 0).sum())) for r in results]
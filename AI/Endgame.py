@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+import time
+
+from bitboard import FULL, popcount, flips, moveMask, squares
+
+# the four 4x4 quadrants, for parity ordering: the last move into a region with an odd number of empties
+# is usually ours, so we want to play into odd regions first
+QUADRANTS = (0x0F0F0F0F, 0xF0F0F0F0, 0x0F0F0F0F << 32, 0xF0F0F0F0 << 32)
+
+# from this many empties down, moves are only ordered by parity (sorting by mobility costs more than it saves)
+PARITY_ONLY = 5
+
+# nodes searched between checks of the deadline
+CHECK_INTERVAL = 100
+
+class _Timeout(Exception):
+	pass
+
+# exact endgame solver on bitboards
+# scores are final disc differences, mine minus the opponent's, for the player to move (negamax)
+class Endgame(object):
+	def __init__(self):
+		self.nodes = 0
+		# (me, opp) -> (lower, upper, best square) for positions with enough empties to be worth remembering
+		self.table = {}
+		self.tableEmpties = 6
+		self.deadline = None
+		self.clock = time.time
+		self.nextCheck = 0
+
+	# best square and score for me to move (there must be a move), or None if it is not solved by the deadline (by clock)
+	# with exact=False only the sign of the score is right: it solves for win, draw or loss, which is much faster
+	def solve(self, me, opp, exact=True, deadline=None, clock=time.time):
+		self.nodes = 0
+		self.nextCheck = CHECK_INTERVAL
+		self.deadline = deadline
+		self.clock = clock
+		try:
+			return self.solveRoot(me, opp, exact)
+		except _Timeout:
+			return None
+		finally:
+			self.table = {}
+
+	def solveRoot(self, me, opp, exact):
+		(alpha, beta) = (-64, 64) if exact else (-1, 1)
+		empties = 64 - popcount(me | opp)
+		best = -1
+		bestScore = -65
+		for (sq, flipped) in self.order(me, opp, moveMask(me, opp), empties):
+			score = -self.search(opp & ~flipped, me | flipped | (1 << sq), -beta, -alpha, empties - 1, False)
+			if score > bestScore:
+				best = sq
+				bestScore = score
+				if score > alpha:
+					alpha = score
+					if alpha >= beta:
+						break
+		return (best, bestScore)
+
+	# fail-soft alpha-beta; passed means the opponent just passed
+	def search(self, me, opp, alpha, beta, empties, passed):
+		self.nodes += 1
+		if self.nodes >= self.nextCheck:
+			self.nextCheck = self.nodes + CHECK_INTERVAL
+			if self.deadline is not None and self.clock() > self.deadline:
+				raise _Timeout()
+		if empties == 2:
+			empty = ~(me | opp) & FULL
+			low = empty & -empty
+			return self.last2(me, opp, alpha, beta, low.bit_length() - 1, (empty ^ low).bit_length() - 1)
+
+		key = None
+		hint = -1
+		if empties >= self.tableEmpties:
+			key = (me, opp)
+			entry = self.table.get(key)
+			if entry is not None:
+				(lower, upper, hint) = entry
+				if lower >= beta or lower == upper:
+					return lower
+				if upper <= alpha:
+					return upper
+				alpha = max(alpha, lower)
+				beta = min(beta, upper)
+		originalAlpha = alpha
+
+		moves = moveMask(me, opp)
+		if not moves:
+			if passed:
+				return popcount(me) - popcount(opp)
+			return -self.search(opp, me, -beta, -alpha, empties, True)
+
+		best = -65
+		bestMove = -1
+		for (sq, flipped) in self.order(me, opp, moves, empties, hint):
+			score = -self.search(opp & ~flipped, me | flipped | (1 << sq), -beta, -alpha, empties - 1, False)
+			if score > best:
+				best = score
+				bestMove = sq
+				if score > alpha:
+					alpha = score
+					if alpha >= beta:
+						break
+
+		if key is not None:
+			(lower, upper, hint) = self.table.get(key, (-64, 64, -1))
+			if best <= originalAlpha:
+				upper = best
+			elif best >= beta:
+				lower = best
+			else:
+				lower = upper = best
+			self.table[key] = (lower, upper, bestMove)
+		return best
+
+	# moves with their flips, in the order to search them; hint is a square to try first, or -1
+	def order(self, me, opp, moves, empties, hint=-1):
+		empty = ~(me | opp) & FULL
+		odd = 0
+		for quadrant in QUADRANTS:
+			if popcount(empty & quadrant) & 1:
+				odd |= quadrant
+
+		if empties <= PARITY_ONLY:
+			return self.parity(me, opp, moves, odd)
+
+		# fastest first: the moves that leave the opponent the fewest replies, odd regions first among equals
+		scored = []
+		for sq in squares(moves):
+			flipped = flips(me, opp, sq)
+			replies = popcount(moveMask(opp & ~flipped, me | flipped | (1 << sq)))
+			scored.append((sq != hint, replies, not (odd >> sq) & 1, sq, flipped))
+		scored.sort()
+		return [(sq, flipped) for (hinted, replies, even, sq, flipped) in scored]
+
+	# moves in odd regions first, flipping only when a move is reached (a cutoff leaves the rest unflipped)
+	def parity(self, me, opp, moves, odd):
+		for sq in squares(moves & odd):
+			yield (sq, flips(me, opp, sq))
+		for sq in squares(moves & ~odd):
+			yield (sq, flips(me, opp, sq))
+
+	# the last two empties, a and b
+	def last2(self, me, opp, alpha, beta, a, b):
+		self.nodes += 1
+		best = -65
+		for (sq, other) in ((a, b), (b, a)):
+			flipped = flips(me, opp, sq)
+			if flipped:
+				score = -self.last1(opp & ~flipped, me | flipped | (1 << sq), other)
+				if score > best:
+					best = score
+					if score >= beta:
+						return best
+					alpha = max(alpha, score)
+		if best != -65:
+			return best
+
+		# pass; if the opponent cannot move either the game is over
+		for (sq, other) in ((a, b), (b, a)):
+			flipped = flips(opp, me, sq)
+			if flipped:
+				score = self.last1(me & ~flipped, opp | flipped | (1 << sq), other)
+				if best == -65 or score < best:
+					best = score
+					if score <= alpha:
+						return best
+		if best != -65:
+			return best
+		return popcount(me) - popcount(opp)
+
+	# the last empty square, sq
+	def last1(self, me, opp, sq):
+		self.nodes += 1
+		myDiscs = popcount(me)
+		flipped = flips(me, opp, sq)
+		if flipped:
+			myDiscs += 1 + popcount(flipped)
+			return 2*myDiscs - 64
+		flipped = flips(opp, me, sq)
+		if flipped:
+			myDiscs -= popcount(flipped)
+			return 2*myDiscs - 64
+		return 2*myDiscs - 63
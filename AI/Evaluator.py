@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+import bitboard
+import stability
+
+TOTAL_MOVES = 64
+
+# squares adjacent to each square
+NEIGHBOURS = [bitboard.neighbours(1 << sq) for sq in range(64)]
+
+# per-class counters packed into one integer, 8 bits per class, each biased so it never borrows from the next
+CLASS_BITS = 8
+CLASS_BIAS = 128
+
+# incremental version of SmartAI.bitboardHeuristic
+# a node's terms are (mine, theirs, classes, frontier, myDiscs, oppDiscs):
+#   mine, theirs: bitboards of my and the opponent's discs
+#   classes: packed count of how many more squares of each class I hold than the opponent
+#   frontier: discs (of either player) with an empty neighbour
+#   myDiscs, oppDiscs: disc counts
+# play() derives a child's terms from its parent's, so undoing a move is just going back to the parent's terms
+class Evaluator(object):
+	def __init__(self, ai):
+		self.ai = ai
+		self.me = ai.me
+		self.classCount = len(ai.classMasks)
+
+		# packed class counter increment for each square, and for every occupancy byte of each row
+		self.squareClass = [0] * 64
+		for i in range(self.classCount):
+			for sq in bitboard.squares(ai.classMasks[i]):
+				self.squareClass[sq] = 1 << (CLASS_BITS*i)
+		self.rowClasses = []
+		for row in range(8):
+			table = [0] * 256
+			for byte in range(1, 256):
+				low = byte & -byte
+				table[byte] = table[byte ^ low] + self.squareClass[row*8 + low.bit_length() - 1]
+			self.rowClasses.append(table)
+		self.bias = sum([CLASS_BIAS << (CLASS_BITS*i) for i in range(self.classCount)])
+
+	def classSum(self, b):
+		total = 0
+		row = 0
+		while b:
+			total += self.rowClasses[row][b & 0xFF]
+			b >>= 8
+			row += 1
+		return total
+
+	# terms for a position, from scratch (list-of-lists or bitboard state)
+	def start(self, state):
+		if len(state) != 3:
+			state = bitboard.fromState(state)
+		mine = state[self.me]
+		theirs = state[3-self.me]
+		empty = ~(mine | theirs) & bitboard.FULL
+		return (
+			mine,
+			theirs,
+			self.bias + self.classSum(mine) - self.classSum(theirs),
+			(mine | theirs) & bitboard.neighbours(empty),
+			bitboard.popcount(mine),
+			bitboard.popcount(theirs)
+		)
+
+	# terms after player takes (row, col), flipping the discs in the 'flipped' mask
+	def play(self, terms, player, row, col, flipped):
+		(mine, theirs, classes, frontier, myDiscs, oppDiscs) = terms
+		sq = row*8 + col
+		bit = 1 << sq
+		flipCount = bitboard.popcount(flipped) if flipped else 0
+		change = self.squareClass[sq] + 2*self.classSum(flipped)
+		if player == self.me:
+			mine |= flipped | bit
+			theirs &= ~flipped
+			classes += change
+			myDiscs += 1 + flipCount
+			oppDiscs -= flipCount
+		else:
+			theirs |= flipped | bit
+			mine &= ~flipped
+			classes -= change
+			oppDiscs += 1 + flipCount
+			myDiscs -= flipCount
+
+		# filling sq can only take neighbouring discs off the frontier, and sq joins it if it has an empty neighbour
+		empty = ~(mine | theirs) & bitboard.FULL
+		candidates = frontier & NEIGHBOURS[sq]
+		while candidates:
+			low = candidates & -candidates
+			if not NEIGHBOURS[low.bit_length() - 1] & empty:
+				frontier ^= low
+			candidates ^= low
+		if NEIGHBOURS[sq] & empty:
+			frontier |= bit
+
+		return (mine, theirs, classes, frontier, myDiscs, oppDiscs)
+
+	# score a node from its terms; same result as SmartAI.bitboardHeuristic
+	def evaluate(self, node):
+		(mine, theirs, classes, frontier, myDiscs, oppDiscs) = node.terms
+		ai = self.ai
+
+		pivotTurn = 10
+		if TOTAL_MOVES - node.round < pivotTurn:
+			score = 2.0 * (float(myDiscs) / (myDiscs + oppDiscs) - 0.5)
+		else:
+			positionalScore = ai.positionalScore([((classes >> (CLASS_BITS*i)) & 0xFF) - CLASS_BIAS for i in range(self.classCount)])
+			if node.max:
+				positionalScore += ai.matrix[node.row][node.col]
+			else:
+				positionalScore -= ai.matrix[node.row][node.col]
+
+			myFrontier = bitboard.popcount(frontier & mine)
+			oppFrontier = bitboard.popcount(frontier & theirs)
+
+			myMobility = bitboard.popcount(bitboard.validMask(mine, theirs, node.round))
+			oppMobility = bitboard.popcount(bitboard.validMask(theirs, mine, node.round))
+
+			(myStability, oppStability) = stability.counts(mine, theirs)
+
+			score = ai.weigh(positionalScore, myFrontier, oppFrontier, myMobility, oppMobility, myStability, oppStability)
+
+		if ai.config['crossCheck']:
+			self.check(node, score)
+		return score
+
+	# compare an incremental score with full evaluations of the same node
+	def check(self, node, score):
+		ai = self.ai
+		board = [0, 0, 0]
+		board[self.me] = node.terms[0]
+		board[3-self.me] = node.terms[1]
+		if node.terms != self.start(board):
+			raise AssertionError('incremental terms %r do not match %r' % (node.terms, self.start(board)))
+
+		state = node.state
+		try:
+			node.state = board
+			full = ai.bitboardHeuristic(node)
+			if not ai.bitboard:
+				node.state = bitboard.toState(board)
+				listScore = ai.__class__.heuristic(ai, node)
+		finally:
+			node.state = state
+
+		# the bitboard heuristic sums the same terms in the same order; the list heuristic sums square by square
+		if score != full:
+			raise AssertionError('incremental evaluation %r does not match full evaluation %r' % (score, full))
+		if not ai.bitboard and abs(score - listScore) > 1e-9:
+			raise AssertionError('incremental evaluation %r does not match list evaluation %r' % (score, listScore))
@@ -1,9 +1,14 @@
 #!/usr/bin/env python
 
+import multiprocessing
 import random
 import time
 
 from AI import AI
+from SearchLog import SearchLog
+from SearchTree import SearchTree
+import bitboard
+import symmetry
 
 TOTAL_MOVES = 64
 
@@ -48,22 +53,24 @@ def heuristic(newState, round, move, player):
 					else:
 						theirFrontier += 1
 		return myInterior + theirFrontier/2
-	# else:				# late game - get stable pieces
-	# 	myStable = 0
-	# 	theirStable = 0
-	# 	unstable = 0
-	# 	for i in range(8):
-	# 		for j in range(8):
-	# 			if newState[i][j] == 0:
-	# 				unstable += 1
-	# 			else:
-	# 				stableFor = stable(newState, i, j)
-	# 				if stableFor == player:
-	# 					myStable += 1
-	# 				elif stableFor == 0:
-	# 					unstable += 1
-	# 				else:
-	# 					theirStable += 1
+
+# same as heuristic, on a bitboard state
+def bitboardHeuristic(newState, round, move, player):
+	if round < 4:
+		return 1
+	elif round < 32:
+		return HEURISTIC_POS_VALS[move[0]][move[1]]
+	else:
+		mine = newState[player]
+		theirs = newState[3-player]
+		open = bitboard.neighbours(~(mine | theirs) & bitboard.FULL)
+		myInterior = bitboard.popcount(mine & ~open)
+		theirFrontier = bitboard.popcount(theirs & open)
+		return myInterior + theirFrontier/2
+	# else:				# late game - get stable pieces (see stability)
+	# 	discs = stability.stable(newState[player], newState[3-player])
+	# 	myStable = bitboard.popcount(discs & newState[player])
+	# 	unstable = TOTAL_MOVES - bitboard.popcount(discs)
 	# 	return myStable + unstable/2
 
 # check whether a position is surrounded
@@ -74,49 +81,6 @@ def surrounded(state, x, y):
 			return False
 	return True
 
-# check whether a position is stable
-def stable(state, x, y):
-	# we are stable if either of these is true, for all four vectors (two orthogonal, two diagonal):
-		# A) we can travel in one of the two directions and hit a wall without hitting any empty or opponent squares
-		# B) we can travel in both directions without hitting any empty squares
-
-	owner = state[x][y]
-	if owner == 0:
-		return 0
-
-	for direction in [(1, 0), (0, 1), (1, 1), (1, -1)]:
-		if not stableOnAngle(state, x, y, direction, owner):
-			return 0
-
-	return owner
-
-def stableOnAngle(state, x, y, angle, player):
-	neitherHasEmpty = True
-
-	for forwardBackward in range(2):
-		thisHasNoEnemyOrEmpty = True
-		i = x
-		j = y
-		while i >= 0 and i < 8 and j >= 0 and j < 8:
-			if state[i][j] == 0:
-				neitherHasEmpty = False
-				thisHasNoEnemyOrEmpty = False
-			elif state[i][j] != player:
-				thisHasNoEnemyOrEmpty = False
-			i += angle[0]
-			j += angle[1]
-
-		if thisHasNoEnemyOrEmpty:
-			return True
-		# reverse ray
-		angle = (-angle[0], -angle[1])
-
-	if neitherHasEmpty:
-		return True
-	return False
-
-
-
 class MoveOption(object):
 	def __init__(self, move):
 		self.move = move
@@ -137,6 +101,14 @@ class MoveOption(object):
 		self.attempts += 1
 		self.losses += 1
 
+	# add (wins, draws, losses) counted elsewhere (by a worker process)
+	def addCounts(self, counts):
+		(wins, draws, losses) = counts
+		self.attempts += wins + draws + losses
+		self.wins += wins
+		self.draws += draws
+		self.losses += losses
+
 	def rate(self):
 		if self.attempts == 0:
 			return 0
@@ -150,14 +122,42 @@ class NewAI(AI):
 		AI.__init__(self, me)
 
 		self.config = {
+			'bitboard': False,
 			'timeUsage': 0.95,	# don't start loops after 90% of time has been used
 			'maxIterations': 1000,
-			'heuristicWeight': 0.02
+			'heuristicWeight': 0.02,
+			'workers': 0,	# processes to run playouts in, 0 or 1 to run them in this process only (flat search)
+			'search': 'flat',	# 'flat' plays out every move alike, 'uct' grows a search tree (see uct())
+			'exploration': 1.4,	# uct exploration constant
+			'treeSize': 65536,	# uct tree slots; once they are used up the tree stops growing
+			'reuse': True,	# keep the uct tree below the opponent's reply for the next move
+			'symmetry': True,	# play out only one of the moves that a symmetry of the board makes equivalent
+			'batchPlayouts': 0,	# flat search: games of every move to play out at once with numpy (see BatchPlayouts), 0 to play them one by one
+			'log': None	# file to append each move's playout statistics to as a json line (see SearchLog), None for none
 		}
 		if config != None:
 			for key, val in config.iteritems():
 				self.config[key] = val
 
+		self.heuristic = heuristic
+		if self.config['bitboard']:
+			self.useBitboard(True)
+			self.heuristic = bitboardHeuristic
+
+		self.tree = None
+		self.spare = None	# second tree to copy the part of the tree kept between moves into
+		self.played = None	# (slot, board) of the move we played from the tree, and the bitboard after it
+		if self.config['search'] == 'uct':
+			self.tree = SearchTree(self.config['treeSize'])
+			if self.config['reuse']:
+				self.spare = SearchTree(self.config['treeSize'])
+		elif self.config['search'] != 'flat':
+			raise ValueError('Unknown search: %s' % self.config['search'])
+
+		self.log = None
+		if self.config['log'] is not None:
+			self.log = SearchLog(self.config['log'])
+
 	# increase time toward the midgame, decrease toward the endgame
 	def distribution(self, round):
 		# return max(2 - abs((32.0 - (round - 2)) / 16.0), 0)
@@ -173,7 +173,7 @@ class NewAI(AI):
 		startTime = time.clock()
 		random.seed(startTime)
 
-		state = kwargs['state']
+		state = self.fromState(kwargs['state'])
 		round = kwargs['round']
 
 		myTimer = kwargs['t1'] if self.me == 1 else kwargs['t2']
@@ -183,22 +183,41 @@ class NewAI(AI):
 		print 'I can spend %f this turn' % (myTimePerTurn)
 
 		validMoves = self.getValidMoves(state, round, self.me)
+		if self.config['symmetry']:
+			validMoves = symmetry.uniqueMoves(state, validMoves)
 		if len(validMoves) == 1:
+			self.played = None # not from the tree
+			if self.log is not None:
+				self.logMove(round, myTimePerTurn, time.clock() - startTime, [], validMoves[0])
 			return validMoves[0]
+
+		timeLeft = myTimePerTurn*self.config['timeUsage'] - (time.clock()-startTime)
+		if self.tree is not None:
+			# the same number of playouts as the flat search
+			move = self.uct(kwargs['state'], round, validMoves, timeLeft, self.config['maxIterations']*len(validMoves))
+			if self.log is not None:
+				tree = self.tree
+				first = tree.first[0]
+				options = [(tree.square[child], tree.visits[child], tree.score[child]) for child in range(first, first + tree.count[0])]
+				self.logMove(round, myTimePerTurn, time.clock() - startTime, options, move, treeNodes=tree.used)
+			return move
+
 		for i in range(0, len(validMoves)):
 			validMoves[i] = MoveOption(validMoves[i])
-
-		remIterations = self.config['maxIterations']
-		while (time.clock()-startTime) < myTimePerTurn*self.config['timeUsage'] and remIterations != 0:
-			remIterations -= 1
-			for moveOption in validMoves:
-				result = self.simulate(self.simMove(state, round, self.me, moveOption.move[0], moveOption.move[1]), round+1, 3-self.me)
-				if result == self.me:
-					moveOption.addWin()
-				elif result == 0:
-					moveOption.addDraw()
-				else:
-					moveOption.addLoss()
+		if self.config['workers'] > 1:
+			# every worker plays out every move, with its own seed, for the whole time left
+			workers = self.config['workers']
+			pool = workerPool(self.me, self.config)
+			moves = [moveOption.move for moveOption in validMoves]
+			iterations = -(-self.config['maxIterations'] // workers)
+			# seeded from the os, so workers never repeat each other's (or an earlier move's) games
+			seed = random.SystemRandom().getrandbits(32)
+			jobs = [(kwargs['state'], round, moves, timeLeft, iterations, seed + i) for i in range(workers)]
+			for counts in pool.map(_playouts, jobs):
+				for i in range(len(validMoves)):
+					validMoves[i].addCounts(counts[i])
+		else:
+			self.playouts(kwargs['state'], round, validMoves, timeLeft, self.config['maxIterations'])
 
 		bestRate = -1
 		bestOption = None
@@ -209,9 +228,170 @@ class NewAI(AI):
 				bestOption = moveOption
 
 		print 'Move score: %f over %d games (%d total)' % (bestRate, moveOption.attempts, moveOption.attempts*len(validMoves))
+		if self.log is not None:
+			options = [(moveOption.move[0]*8 + moveOption.move[1], moveOption.attempts, moveOption.wins + 0.5*moveOption.draws)
+				for moveOption in validMoves]
+			self.logMove(round, myTimePerTurn, time.clock() - startTime, options, bestOption.move)
 
 		return bestOption.move
 
+	# write a move (from move(): seconds spent of the budget, and the move chosen) to the log, with the playouts
+	# of each root move, options, as (square, playouts, score); in uct, playouts include those kept from earlier moves
+	def logMove(self, round, budget, elapsed, options, move, **fields):
+		playouts = sum([count for (sq, count, score) in options])
+		record = {'ai': 'new', 'search': self.config['search'], 'player': self.me, 'round': round, 'budget': budget,
+			'seconds': elapsed, 'playouts': playouts, 'playoutsPerSecond': playouts / max(elapsed, 1e-9),
+			'moves': [{'move': [sq >> 3, sq & 7], 'playouts': count, 'rate': score / count if count > 0 else None}
+				for (sq, count, score) in options],
+			'move': move}
+		record.update(fields)
+		self.log.write(record)
+
+	# play out every move option from a (list-of-lists) state, for the given seconds (by clock) or number of iterations,
+	# and count the results
+	def playouts(self, position, round, validMoves, seconds, iterations, clock=time.clock):
+		if self.config['batchPlayouts'] > 0:
+			self.batchPlayouts(position, round, validMoves, seconds, iterations, clock)
+			return
+		startTime = clock()
+		# every playout is played on state, which is then put back from this copy
+		state = self.fromState(position)
+		start = self.fromState(position)
+		while (clock()-startTime) < seconds and iterations != 0:
+			iterations -= 1
+			for moveOption in validMoves:
+				self.simMoveInPlace(state, round, self.me, moveOption.move[0], moveOption.move[1])
+				result = self.simulate(state, round+1, 3-self.me)
+				self.restoreState(state, start)
+				if result == self.me:
+					moveOption.addWin()
+				elif result == 0:
+					moveOption.addDraw()
+				else:
+					moveOption.addLoss()
+
+	# playouts, batchPlayouts games of every move at a time, so the time is only checked between batches
+	def batchPlayouts(self, position, round, validMoves, seconds, iterations, clock):
+		# numpy is only needed for this
+		import BatchPlayouts
+		startTime = clock()
+		board = bitboard.fromState(position)
+		squares = [moveOption.move[0]*8 + moveOption.move[1] for moveOption in validMoves]
+		rng = BatchPlayouts.randomState()
+		batch = self.config['batchPlayouts']
+		while (clock()-startTime) < seconds and iterations != 0:
+			games = batch if iterations < 0 else min(batch, iterations)
+			iterations -= games
+			counts = BatchPlayouts.playouts(board, round, self.me, squares, games, rng)
+			for i in range(len(validMoves)):
+				validMoves[i].addCounts(counts[i])
+
+	# monte carlo tree search from a (list-of-lists) state, for the given seconds or number of playouts
+	# each playout walks down the tree by UCB1, adds the children of the node it stops at, plays the game out
+	# from the first new child and counts the result on the way back up; returns the most visited move
+	def uct(self, position, round, validMoves, seconds, playouts):
+		self.clock = time.clock
+		self.deadline = self.clock() + seconds
+		board = bitboard.fromState(position)
+		if not self.reroot(board):
+			self.tree.reset(self.me)
+		tree = self.tree
+		if tree.count[0] == -1:
+			tree.expand(0, [move[0]*8 + move[1] for move in validMoves], self.me)
+		self.grow(position, round, self.me, playouts)
+		self.deadline = None
+
+		# with no playouts at all (no time, and nothing kept from the last move), this is the root's first move
+		best = tree.best()
+		if tree.visits[best] == 0:
+			print 'Out of time before any games, playing the first move'
+		else:
+			print 'Move score: %f over %d games (%d total, %d tree nodes)' % (
+				tree.score[best] / tree.visits[best], tree.visits[best], tree.visits[0], tree.used)
+
+		if self.spare is not None:
+			sq = tree.square[best]
+			flipped = bitboard.flips(board[self.me], board[self.opp], sq)
+			board[self.me] |= flipped | (1 << sq)
+			board[self.opp] &= ~flipped
+			self.played = (best, board)
+		return [tree.square[best] >> 3, tree.square[best] & 7]
+
+	# run playouts through the tree from its root, a (list-of-lists) position with player to move,
+	# until the deadline or the given number of playouts (-1 for no limit)
+	def grow(self, position, round, player, playouts):
+		tree = self.tree
+		exploration = self.config['exploration']
+		state = self.fromState(position)
+		start = self.fromState(position)
+		rootPlayer = player
+		while self.clock() < self.deadline and playouts != 0:
+			playouts -= 1
+			node = 0
+			r = round
+			player = rootPlayer
+			while r < TOTAL_MOVES:
+				if tree.count[node] == -1 and not self.expand(node, state, r, player):
+					break # out of slots, play out from here
+				if tree.count[node] == 0:
+					break # game over
+				node = tree.select(node, exploration)
+				sq = tree.square[node]
+				if sq != -1:
+					self.simMoveInPlace(state, r, player, sq >> 3, sq & 7)
+					r += 1
+				player = 3-player
+				if tree.visits[node] == 0:
+					break
+			tree.update(node, self.simulate(state, r, player))
+			self.restoreState(state, start)
+
+	# grow the tree below the move we played, over all of the opponent's replies, until stopped
+	def ponder(self, state, round):
+		if self.played is None:
+			return
+		(child, after) = self.played
+		tree = self.tree
+		self.tree = tree.keep(child, self.spare)
+		self.spare = tree
+		self.played = (0, after) # the opponent's reply will be one of the new root's children
+		self.grow(bitboard.toState(after), round, self.opp, -1)
+
+	# make the tree's root the (bitboard) position the game has reached since our last move, if the tree has it:
+	# the opponent's reply to the move we played; the rest of the tree is dropped
+	def reroot(self, board):
+		if self.played is None:
+			return False
+		(child, after) = self.played
+		self.played = None
+		tree = self.tree
+		first = tree.first[child]
+		for node in range(first, first + max(tree.count[child], 0)):
+			reached = after[:]
+			sq = tree.square[node]
+			if sq != -1:
+				flipped = bitboard.flips(after[self.opp], after[self.me], sq)
+				reached[self.opp] |= flipped | (1 << sq)
+				reached[self.me] &= ~flipped
+			if reached == board:
+				self.tree = tree.keep(node, self.spare)
+				self.spare = tree
+				print 'Kept %d tree nodes (%d games) from the last move' % (self.tree.used, self.tree.visits[0])
+				return True
+		return False
+
+	# add the children of a tree node for player to move in state; a player with no moves gets a single pass child
+	def expand(self, node, state, round, player):
+		moves = self.getValidMoves(state, round, player)
+		if len(moves) > 0:
+			squares = [move[0]*8 + move[1] for move in moves]
+		elif len(self.getValidMoves(state, round, 3-player)) > 0:
+			squares = [-1]
+		else:
+			squares = []
+		return self.tree.expand(node, squares, player)
+
+	# play a game out randomly from state (in place) and return the winner
 	def simulate(self, state, round, player):
 		while round < TOTAL_MOVES:
 			validMoves = self.getValidMoves(state, round, player)
@@ -219,16 +399,17 @@ class NewAI(AI):
 				player = 3-player
 				validMoves = self.getValidMoves(state, round, player)
 				if len(validMoves) == 0:
-					# no one can move; the player that put it in this state gets empty tiles
-					for i in range(8):
-						for j in range(8):
-							state[i][j] = player
-					break
+					# no one can move; the player that put it in this state gets empty tiles (and so the win)
+					return player
 
 			move = None
 			if random.random() < self.config['heuristicWeight']:
 				# we care about heuristic
-				weights = [heuristic(self.simMove(state, round, player, validMoves[i][0], validMoves[i][1]), round, validMoves[i], player) for i in range(len(validMoves))]
+				weights = []
+				for candidate in validMoves:
+					self.makeMove(state, round, player, candidate[0], candidate[1])
+					weights.append(self.heuristic(state, round, candidate, player))
+					self.unmakeMove(state)
 				totalWeight = 0
 				for weight in weights:
 					totalWeight += weight
@@ -248,16 +429,38 @@ class NewAI(AI):
 			round += 1
 			player = 3-player
 
-		p1Count = 0
-		p2Count = 0
-		for col in state:
-			for square in col:
-				if square == 1:
-					p1Count += 1
-				elif square == 2:
-					p2Count += 1
+		p1Count = self.countScore(state, 1)
+		p2Count = self.countScore(state, 2)
 		if p1Count > p2Count:
 			return 1
 		elif p2Count > p1Count:
 			return 2
 		return 0
+
+
+# worker pools for parallel playouts, one per player and config, started once and reused every move
+_pools = {}
+
+def workerPool(me, config):
+	key = (me, tuple(sorted(config.items())))
+	if key not in _pools:
+		_pools[key] = multiprocessing.Pool(config['workers'], initializer=_startWorker, initargs=(me, config))
+	return _pools[key]
+
+# the NewAI of a worker process
+_worker = None
+
+def _startWorker(me, config):
+	global _worker
+	config = dict(config)
+	config['log'] = None
+	_worker = NewAI(me, config)
+
+# run playouts in a worker; job is (state, round, moves, seconds, iterations, seed), returns (wins, draws, losses) per move
+def _playouts(job):
+	(state, round, moves, seconds, iterations, seed) = job
+	random.seed(seed)
+	validMoves = [MoveOption(move) for move in moves]
+	# by wall time, since workers may share cores
+	_worker.playouts(state, round, validMoves, seconds, iterations, time.time)
+	return [(moveOption.wins, moveOption.draws, moveOption.losses) for moveOption in validMoves]
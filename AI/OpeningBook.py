@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+import mmap
+import random
+import struct
+import sys
+import time
+
+from SmartAI import SmartAI
+from TranspositionTable import hashState
+import bitboard
+import symmetry
+
+# book file: MAGIC, then one record per position, sorted by key:
+#   key: zobrist hash of the canonical position and the side to move (see key())
+#   square: the book move in the canonical position, as a square index
+#   depth: the depth it was searched to
+#   score: its search value, for the side to move
+MAGIC = 'RVBOOK02'
+RECORD = struct.Struct('<QBBf')
+
+# (book key, transform) for a list-of-lists state with player to move; all 8 symmetric images of a position
+# share a key, and the transform takes the state's squares to the canonical position's
+def key(state, player):
+	(canon, t) = symmetry.canonical(bitboard.fromState(state))
+	return (hashState(canon, player == 1), t)
+
+# write {key: (square, depth, score)} to a book file
+def write(path, entries):
+	with open(path, 'wb') as file:
+		file.write(MAGIC)
+		for k in sorted(entries):
+			(square, depth, score) = entries[k]
+			file.write(RECORD.pack(k, square, depth, score))
+
+# read-only opening book, memory mapped so nothing is loaded until a position is looked up
+class OpeningBook(object):
+	def __init__(self, path):
+		self.file = open(path, 'rb')
+		self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+		if self.map[:len(MAGIC)] != MAGIC:
+			raise ValueError('Not an opening book: %s' % path)
+		self.count = (len(self.map) - len(MAGIC)) // RECORD.size
+
+	def close(self):
+		self.map.close()
+		self.file.close()
+
+	# (square, depth, score) for a key, or None
+	def find(self, k):
+		low = 0
+		high = self.count
+		while low < high:
+			middle = (low + high) // 2
+			record = RECORD.unpack_from(self.map, len(MAGIC) + middle*RECORD.size)
+			if record[0] < k:
+				low = middle + 1
+			elif record[0] > k:
+				high = middle
+			else:
+				return record[1:]
+		return None
+
+	# the book's [row, col] move for player in a list-of-lists state, or None if the position is not in the book
+	def move(self, state, player):
+		(k, t) = key(state, player)
+		entry = self.find(k)
+		if entry is None:
+			return None
+		return symmetry.untransformMove([entry[0] >> 3, entry[0] & 7], t)
+
+# fixed depth search of a list-of-lists state by ai; returns the root node
+def search(ai, state, round, depth):
+	ai.newSearch(round)
+	board = ai.fromState(state)
+	for d in range(1, depth + 1):
+		root = ai.root(board, round, d)
+		ai.minimax(root)
+		ai.pv = root.pv
+	return root
+
+# self-play games: the first randomPlies moves of each are random, the rest are searched to depth,
+# and every position in the first plies moves is searched and put in the book
+# returns {key: (square, depth, score)}
+def build(plies, depth, games, randomPlies, seed=0, config=None):
+	if config is None:
+		config = {'bitboard': True, 'moveOrdering': True, 'transpositionTableSize': 1 << 18}
+	rng = random.Random(seed)
+	ais = [None, SmartAI(1, config), SmartAI(2, config)]
+	entries = {}
+	for game in range(games):
+		board = bitboard.fromState([[0 for y in range(8)] for x in range(8)])
+		player = 1
+		round = 0
+		while round < plies:
+			moves = bitboard.validMask(board[player], board[3-player], round)
+			if moves == 0:
+				player = 3-player
+				if bitboard.validMask(board[player], board[3-player], round) == 0:
+					break
+				continue
+
+			state = bitboard.toState(board)
+			(k, t) = key(state, player)
+			if k not in entries:
+				root = search(ais[player], state, round, depth)
+				entries[k] = (symmetry.SQUARES[t][root.move], depth, root.value)
+			if round < randomPlies:
+				sq = rng.choice(list(bitboard.squares(moves)))
+			else:
+				sq = symmetry.SQUARES[symmetry.INVERSE[t]][entries[k][0]]
+
+			flipped = bitboard.flips(board[player], board[3-player], sq)
+			board[player] |= flipped | (1 << sq)
+			board[3-player] &= ~flipped
+			player = 3-player
+			round += 1
+		print 'Game %d: %d positions' % (game + 1, len(entries))
+	return entries
+
+# call: python OpeningBook.py [path] [plies] [depth] [games] [randomPlies]
+#   builds a book of the positions in the first plies moves of self-play games, each searched to depth
+if __name__ == '__main__':
+	if len(sys.argv) < 2:
+		print 'USAGE: python OpeningBook.py [path] [plies] [depth] [games] [randomPlies]'
+		sys.exit()
+
+	path = sys.argv[1]
+	plies = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+	depth = int(sys.argv[3]) if len(sys.argv) > 3 else 6
+	games = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+	randomPlies = int(sys.argv[5]) if len(sys.argv) > 5 else 8
+
+	start = time.time()
+	entries = build(plies, depth, games, randomPlies)
+	write(path, entries)
+	print 'Wrote %d positions to %s in %.1f seconds' % (len(entries), path, time.time() - start)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+
+from array import array
+import struct
+import sys
+import time
+
+import bitboard
+import symmetry
+
+TOTAL_MOVES = 64
+
+# the patterns, each as its squares in one orientation; a pattern's instances are its images under the board's
+# symmetries (see symmetry), one per distinct set of squares, and all of them share the pattern's table
+PATTERNS = [
+	('edge', [(0, col) for col in range(8)]),
+	('corner3x3', [(row, col) for row in range(3) for col in range(3)]),
+	('corner2x5', [(row, col) for row in range(2) for col in range(5)]),
+	('diagonal8', [(i, i) for i in range(8)]),
+	('diagonal7', [(i, i + 1) for i in range(7)]),
+	('diagonal6', [(i, i + 2) for i in range(6)]),
+	('diagonal5', [(i, i + 3) for i in range(5)]),
+	('diagonal4', [(i, i + 4) for i in range(4)])
+]
+
+# each pattern's table has one entry per arrangement of its squares, indexed in base 3:
+# square i of the pattern adds 3**i times 0 if it is empty, 1 if it is mine, 2 if it is the opponent's
+# the tables are from the side of the player to move: 'mine' are the mover's discs, and the entries add up to the
+# mover's final disc difference (see fit); to score a position where the opponent is to move, PatternEvaluator
+# looks it up from the opponent's side (mine and theirs swapped) and negates the result
+SIZES = [3 ** len(squares) for (name, squares) in PATTERNS]
+OFFSETS = [sum(SIZES[:i]) for i in range(len(PATTERNS))] # of each pattern's table in a stage's tables
+TABLE_SIZE = sum(SIZES)
+
+def _instances():
+	instances = []
+	for p in range(len(PATTERNS)):
+		seen = set()
+		for t in symmetry.TRANSFORMS:
+			squares = [symmetry.SQUARES[t][row*8 + col] for (row, col) in PATTERNS[p][1]]
+			if frozenset(squares) not in seen:
+				seen.add(frozenset(squares))
+				instances.append((p, squares))
+	return instances
+
+# for every entry of every pattern's table, the entry for the same arrangement with the players' discs swapped
+def swappedIndices():
+	result = []
+	for p in range(len(PATTERNS)):
+		swapped = [0]
+		for i in range(len(PATTERNS[p][1])):
+			# digit 0 stays 0, 1 becomes 2 and 2 becomes 1
+			power = 3 ** i
+			swapped = swapped + [index + 2*power for index in swapped] + [index + power for index in swapped]
+		result.extend([OFFSETS[p] + index for index in swapped])
+	return result
+
+# (pattern, squares) of every instance
+INSTANCES = _instances()
+# each instance's table offset
+INSTANCE_OFFSETS = [OFFSETS[p] for (p, squares) in INSTANCES]
+# for each square, (instance, power of 3) for every instance it is in
+SQUARE_INSTANCES = [[] for sq in range(64)]
+for i in range(len(INSTANCES)):
+	squares = INSTANCES[i][1]
+	for j in range(len(squares)):
+		SQUARE_INSTANCES[squares[j]].append((i, 3 ** j))
+
+# pattern file: MAGIC, then a header of (stages, scale), then for every stage (earliest first) the tables of every
+# pattern (in PATTERNS order) as little-endian int16 values; an entry's value is its int16 value times scale,
+# in discs of final disc difference for the player to move, whose discs count as 'mine'
+MAGIC = 'RVPATT01'
+HEADER = struct.Struct('<If')
+
+# the stage (of the file's stages, which split the game's rounds evenly) a round's position belongs to
+def stage(round, stages):
+	return min(round * stages // TOTAL_MOVES, stages - 1)
+
+# (stages, scale, tables) from a pattern file, with tables a list of one int16 array per stage
+def read(path):
+	with open(path, 'rb') as file:
+		if file.read(len(MAGIC)) != MAGIC:
+			raise ValueError('Not a pattern file: %s' % path)
+		(stages, scale) = HEADER.unpack(file.read(HEADER.size))
+		tables = []
+		for s in range(stages):
+			table = array('h')
+			table.fromfile(file, TABLE_SIZE)
+			if sys.byteorder != 'little':
+				table.byteswap()
+			tables.append(table)
+	return (stages, scale, tables)
+
+# write float tables (one sequence of TABLE_SIZE values per stage) to a pattern file, rounded to int16 steps of scale
+def write(path, tables, scale):
+	with open(path, 'wb') as file:
+		file.write(MAGIC)
+		file.write(HEADER.pack(len(tables), scale))
+		for values in tables:
+			table = array('h', [max(-32767, min(32767, int(round(value / scale)))) for value in values])
+			if sys.byteorder != 'little':
+				table.byteswap()
+			table.tofile(file)
+
+# the base 3 index of every instance for my and the opponent's discs (bitboards)
+def indices(mine, theirs):
+	result = []
+	for (p, squares) in INSTANCES:
+		index = 0
+		power = 1
+		for sq in squares:
+			if (mine >> sq) & 1:
+				index += power
+			elif (theirs >> sq) & 1:
+				index += 2*power
+			power *= 3
+		result.append(index)
+	return result
+
+# pattern table evaluation for SmartAI, kept up to date move by move like Evaluator
+# a node's terms are (mine, theirs, indices): my and the opponent's discs, and every instance's table index
+# (with my discs as 'mine', whoever is to move)
+# play() derives a child's terms from its parent's, changing only the indices of instances that the move touches
+class PatternEvaluator(object):
+	def __init__(self, ai, path):
+		self.ai = ai
+		self.me = ai.me
+		(self.stages, self.scale, self.tables) = read(path)
+		# the tables for when the opponent is to move: each entry is minus the entry with the discs swapped,
+		# so indices with my discs as 'mine' give my final disc difference
+		swapped = swappedIndices()
+		self.theirTables = [array('h', [-table[index] for index in swapped]) for table in self.tables]
+		# each round's tables, for when I am to move and for when the opponent is
+		self.myRoundTables = [self.tables[stage(round, self.stages)] for round in range(TOTAL_MOVES + 1)]
+		self.theirRoundTables = [self.theirTables[stage(round, self.stages)] for round in range(TOTAL_MOVES + 1)]
+
+	# terms for a position, from scratch (list-of-lists or bitboard state)
+	def start(self, state):
+		if len(state) != 3:
+			state = bitboard.fromState(state)
+		mine = state[self.me]
+		theirs = state[3-self.me]
+		return (mine, theirs, indices(mine, theirs))
+
+	# terms after player takes (row, col), flipping the discs in the 'flipped' mask
+	def play(self, terms, player, row, col, flipped):
+		(mine, theirs, index) = terms
+		index = index[:]
+		sq = row*8 + col
+		if player == self.me:
+			mine |= flipped | (1 << sq)
+			theirs &= ~flipped
+			(placed, turned) = (1, -1) # a flip turns a 2 into a 1
+		else:
+			theirs |= flipped | (1 << sq)
+			mine &= ~flipped
+			(placed, turned) = (2, 1)
+		for (i, power) in SQUARE_INSTANCES[sq]:
+			index[i] += placed * power
+		while flipped:
+			low = flipped & -flipped
+			for (i, power) in SQUARE_INSTANCES[low.bit_length() - 1]:
+				index[i] += turned * power
+			flipped ^= low
+		return (mine, theirs, index)
+
+	# score a node from its terms: the sum of its instances' table entries for its round's stage,
+	# from the side of the player to move (me at max nodes)
+	def evaluate(self, node):
+		if node.max:
+			table = self.myRoundTables[node.round]
+		else:
+			table = self.theirRoundTables[node.round]
+		index = node.terms[2]
+		score = 0
+		for i in range(len(index)):
+			score += table[INSTANCE_OFFSETS[i] + index[i]]
+		if self.ai.config['crossCheck']:
+			self.check(node)
+		return score * self.scale
+
+	# compare incremental terms with terms from scratch
+	def check(self, node):
+		board = [0, 0, 0]
+		board[self.me] = node.terms[0]
+		board[3-self.me] = node.terms[1]
+		if node.terms != self.start(board):
+			raise AssertionError('incremental terms %r do not match %r' % (node.terms, self.start(board)))
+
+# fit pattern tables to the positions of a dataset (see dataset.py) by least squares on the final disc difference
+# for the side to move, separately for each stage; returns one list of TABLE_SIZE floats per stage
+# entries are fitted a pass at a time: each moves by the average error of the positions it appears in,
+# divided among the instances, shrunk toward 0 by regularization for entries that appear in few positions
+def fit(records, stages, passes=30, regularization=5.0):
+	# numpy is only needed for fitting
+	import numpy
+	from BatchEvaluator import unpack
+
+	records = records[records['round'] >= 4]
+	instanceSquares = numpy.array([squares + [squares[0]] * (10 - len(squares)) for (p, squares) in INSTANCES])
+	powers = numpy.array([[3 ** j if j < len(squares) else 0 for j in range(10)] for (p, squares) in INSTANCES])
+	offsets = numpy.array(INSTANCE_OFFSETS)
+
+	tables = []
+	for s in range(stages):
+		chunk = records[numpy.array([stage(round, stages) for round in range(TOTAL_MOVES)])[records['round']] == s]
+		black = chunk['player'] == 1
+		mine = numpy.where(black, chunk['black'], chunk['white'])
+		theirs = numpy.where(black, chunk['white'], chunk['black'])
+		y = numpy.where(black, chunk['score'], -chunk['score'].astype(numpy.int64)).astype(numpy.float64)
+		# (positions, instances) table entry of every instance, a block of positions at a time to bound the memory used
+		entries = numpy.zeros((len(chunk), len(INSTANCES)), dtype=numpy.int32)
+		for start in range(0, len(chunk), 100000):
+			digits = unpack(mine[start:start + 100000]) + 2 * unpack(theirs[start:start + 100000])
+			entries[start:start + 100000] = (digits[:, instanceSquares] * powers).sum(axis=2) + offsets
+		counts = numpy.bincount(entries.ravel(), minlength=TABLE_SIZE)
+		weights = numpy.zeros(TABLE_SIZE)
+		for i in range(passes):
+			error = y - weights[entries].sum(axis=1)
+			total = numpy.bincount(entries.ravel(), weights=numpy.repeat(error, len(INSTANCES)), minlength=TABLE_SIZE)
+			weights += total / (counts + regularization) / len(INSTANCES) * 2
+		print 'Stage %d: %d positions, mean absolute error %.2f discs' % (s, len(y), numpy.abs(y - weights[entries].sum(axis=1)).mean())
+		tables.append(list(weights))
+	return tables
+
+# call: python Patterns.py [dataset] [path] [stages]
+#   fits pattern tables to the positions in a dataset (see dataset.py) and writes them to a pattern file,
+#   for a player config with "ai": "pattern" and "patterns": path
+if __name__ == '__main__':
+	if len(sys.argv) < 3:
+		print 'USAGE: python Patterns.py [dataset] [path] [stages]'
+		sys.exit()
+
+	import dataset
+	stages = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+	start = time.time()
+	tables = fit(dataset.load(sys.argv[1]), stages)
+	scale = max([max([abs(value) for value in values]) for values in tables]) / 32767 or 1.0
+	write(sys.argv[2], tables, scale)
+	print 'Wrote %d stages of %d entries to %s in %.1f seconds' % (stages, TABLE_SIZE, sys.argv[2], time.time() - start)
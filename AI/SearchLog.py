@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+
+import json
+import time
+
+# per-move search statistics, appended to a file as json lines (one object per move)
+# the AIs only make one when their 'log' config names a file, and only count what it records when they have one,
+# so a search without a log does no extra work
+class SearchLog(object):
+	def __init__(self, path):
+		self.file = open(path, 'a')
+
+	# write one record (a dict), with the time it was written
+	def write(self, record):
+		record['time'] = time.time()
+		self.file.write(json.dumps(record) + '\n')
+		self.file.flush()
+
+	def close(self):
+		self.file.close()
+
+# the records of a log file, in order
+def read(path):
+	with open(path) as file:
+		return [json.loads(line) for line in file if line.strip()]
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+from array import array
+import math
+
+# monte carlo search tree stored in fixed size arrays of slots, so its memory is allocated once, up front
+# slot 0 is the root, and the children of a node take consecutive slots; for each slot:
+#   square: the move into the node, as a square index (-1 for a pass, and for the root)
+#   mover: the player who made that move
+#   parent: the parent's slot (-1 for the root)
+#   first, count: the first child's slot and the number of children (count is -1 until the node is expanded)
+#   visits, score: playouts through the node, and their score for the mover (1 per win, 0.5 per draw)
+class SearchTree(object):
+	def __init__(self, size):
+		self.size = size
+		self.square = array('b', [0]) * size
+		self.mover = array('b', [0]) * size
+		self.parent = array('i', [0]) * size
+		self.first = array('i', [0]) * size
+		self.count = array('b', [0]) * size
+		self.visits = array('i', [0]) * size
+		self.score = array('d', [0.0]) * size
+		self.used = 0
+
+	def clear(self, slot, square, mover, parent):
+		self.square[slot] = square
+		self.mover[slot] = mover
+		self.parent[slot] = parent
+		self.first[slot] = 0
+		self.count[slot] = -1
+		self.visits[slot] = 0
+		self.score[slot] = 0.0
+
+	# start over from a position with player to move
+	def reset(self, player):
+		self.clear(0, -1, 3-player, -1)
+		self.used = 1
+
+	# give a node one child per square (-1 for a pass) played by mover, or none if the game is over
+	# returns False, leaving the node unexpanded, if the tree has no room left
+	def expand(self, node, squares, mover):
+		if self.used + len(squares) > self.size:
+			return False
+		first = self.used
+		for i in range(len(squares)):
+			self.clear(first + i, squares[i], mover, node)
+		self.first[node] = first
+		self.count[node] = len(squares)
+		self.used += len(squares)
+		return True
+
+	# the child of an expanded node with the best UCB1 value (any unvisited child first)
+	def select(self, node, exploration):
+		visits = self.visits
+		score = self.score
+		logVisits = math.log(max(visits[node], 1))
+		best = -1
+		bestValue = None
+		first = self.first[node]
+		for child in range(first, first + self.count[node]):
+			n = visits[child]
+			if n == 0:
+				return child
+			value = score[child] / n + exploration * math.sqrt(logVisits / n)
+			if best == -1 or value > bestValue:
+				best = child
+				bestValue = value
+		return best
+
+	# count a playout's winner (0 for a draw) on every node from node up to the root
+	def update(self, node, winner):
+		while node != -1:
+			self.visits[node] += 1
+			if winner == self.mover[node]:
+				self.score[node] += 1
+			elif winner == 0:
+				self.score[node] += 0.5
+			node = self.parent[node]
+
+	# copy the subtree under node into another tree, with node as its root, and return that tree
+	# (slots outside the subtree are not copied, so the space they took is free again)
+	def keep(self, node, tree):
+		tree.clear(0, self.square[node], self.mover[node], -1)
+		tree.used = 1
+		queue = [(node, 0)]
+		i = 0
+		while i < len(queue):
+			(old, new) = queue[i]
+			i += 1
+			tree.visits[new] = self.visits[old]
+			tree.score[new] = self.score[old]
+			count = self.count[old]
+			if count > 0:
+				first = tree.used
+				tree.first[new] = first
+				tree.count[new] = count
+				tree.used += count
+				for k in range(count):
+					child = self.first[old] + k
+					tree.clear(first + k, self.square[child], self.mover[child], new)
+					queue.append((child, first + k))
+			else:
+				tree.count[new] = count
+		return tree
+
+	# the root's most visited child
+	def best(self):
+		best = -1
+		first = self.first[0]
+		for child in range(first, first + self.count[0]):
+			if best == -1 or self.visits[child] > self.visits[best]:
+				best = child
+		return best
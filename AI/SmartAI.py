@@ -1,25 +1,56 @@
 #!/usr/bin/env python
 
-import heapq
+import multiprocessing
 import time
 
 from AI import AI
+from Endgame import Endgame
+from Evaluator import Evaluator
+from Patterns import PatternEvaluator
+from SearchLog import SearchLog
+from TranspositionTable import TranspositionTable, hashState, hashMove, SIDE_KEY, EXACT, LOWER, UPPER
+import bitboard
+import stability
+import symmetry
 
 TOTAL_MOVES = 64
 
+NO_LINE = [] # shared empty best line (never modified)
+
+# which of the config's square values (r, c, x, a, b, m, t) applies to each square
+SQUARE_CLASSES = [
+	'rcabbacr',
+	'cxttttxc',
+	'atmmmmta',
+	'btmmmmtb',
+	'btmmmmtb',
+	'atmmmmta',
+	'cxttttxc',
+	'rcabbacr'
+]
+
+# raised inside a search that has run past its deadline
+class SearchTimeout(Exception):
+	pass
+
 # class to represent a state and its relevant information
-# TODO: implement memoization of previously computed nodes
+# hash is the zobrist hash of the state and side to move (only kept up to date when the transposition table is on)
 class Node(object):
-	def __init__(self, state, round, row=-1, col=-1, depth=5, max=True, alpha=-float('inf'), beta=float('inf')):
+	def __init__(self, state, round, row=-1, col=-1, depth=5, max=True, alpha=-float('inf'), beta=float('inf'), hash=0):
 		self.state = state
 		self.round = round
 		self.value = -1
+		self.move = -1 # best move found, as a square index
 		self.row = row
 		self.col = col
 		self.max = max
 		self.depth = depth
 		self.alpha = alpha
 		self.beta = beta
+		self.hash = hash
+		self.pv = NO_LINE # best line found below this node, as square indices
+		self.terms = None # incrementally updated evaluation terms (see Evaluator)
+		self.onPV = False # whether this node lies on the previous iteration's best line
 
 # sum a given score over a set of squares (used to shortcut valuation of squares in heuristic)
 def scoreRange(state, squares, player, points):
@@ -34,13 +65,13 @@ def countScore(state, player):
 				score += 1
 	return score
 
-# count the final score of a finished game; used when few moves remain to explore the whole tree
-def winner(state):
-	score = countScore(state, TOTAL_MOVES)
-	if score > TOTAL_MOVES - score:
+# value of a finished game from my and the opponent's disc counts; used when few moves remain to explore the whole tree
+def winner(myScore, oppScore):
+	if myScore > oppScore:
 		return float('inf')
-	else:
+	elif myScore < oppScore:
 		return -float('inf')
+	return 0
 
 # get the neighbors of a position within the board
 def neighbors(x, y):
@@ -57,53 +88,26 @@ def surrounded(state, x, y):
 def cross(l1, l2):
 	return [(i,j) for j in l2 for i in l1]
 
-# check whether a position is stable
-def stable(state, x, y):
-	# we are stable if either of these is true, for all four vectors (two orthogonal, two diagonal):
-		# A) we can travel in one of the two directions and hit a wall without hitting any empty or opponent squares
-		# B) we can travel in both directions without hitting any empty squares
-
-	owner = state[x][y]
-	if owner == 0:
-		return 0
-
-	for direction in [(1, 0), (0, 1), (1, 1), (1, -1)]:
-		if not stableOnAngle(state, x, y, direction, owner):
-			return 0
-
-	return owner
-
-def stableOnAngle(state, x, y, angle, player):
-	neitherHasEmpty = True
-
-	for forwardBackward in range(2):
-		thisHasNoEnemyOrEmpty = True
-		i = x
-		j = y
-		while i >= 0 and i < 8 and j >= 0 and j < 8:
-			if state[i][j] == 0:
-				neitherHasEmpty = False
-				thisHasNoEnemyOrEmpty = False
-			elif state[i][j] != player:
-				thisHasNoEnemyOrEmpty = False
-			i += angle[0]
-			j += angle[1]
-
-		if thisHasNoEnemyOrEmpty:
-			return True
-		# reverse ray
-		angle = (-angle[0], -angle[1])
-
-	if neitherHasEmpty:
-		return True
-	return False
-
 class SmartAI(AI):
 	def __init__(self, me, config=None):
 		AI.__init__(self, me)
 
 		self.config = {
-			'timeFactor': 4,
+			'bitboard': False,
+			'checkSeconds': 0.002, # seconds of search between checks of the turn's deadline (however long a node takes)
+			'transpositionTableSize': 0, # entries in the transposition table, 0 to disable
+			'transpositionPolicy': 'depth', # replacement policy, 'depth' or 'always'
+			'moveOrdering': False, # search previous best line, killer and history moves first
+			'incrementalEval': False, # keep positional, frontier and disc count terms up to date move by move
+			'patterns': None, # pattern table file (see Patterns) to evaluate positions with instead of the heuristic
+			'batchLeaves': False, # evaluate sibling leaves together with numpy (see BatchEvaluator)
+			'crossCheck': False, # check every incremental or batched evaluation against a full one (slow, for testing)
+			'workers': 0, # processes to search root moves in parallel, 0 or 1 to search in this process only
+			'reuse': True, # start from the previous move's best line (and killers) when the game followed it
+			'symmetry': True, # search only one of the root moves that a symmetry of the board makes equivalent
+			'endgameEmpties': 0, # solve the rest of the game (see Endgame) from this many empty squares, 0 to never
+			'endgameExact': False, # solve for the final disc difference, rather than only win, draw or loss (slower)
+			'log': None, # file to append each move's search statistics to as a json line (see SearchLog), None for none
 			'positionalWeight': 7.0,
 			'frontierWeight': 2.0,
 			'mobilityWeight': 8.0,
@@ -121,24 +125,105 @@ class SmartAI(AI):
 				self.config[key] = val
 
 		# positional score
-		r = self.config['r'] # corner
-		c = self.config['c'] # c-squares (between corner and edge)
-		x = self.config['x'] # x-squares (between center and corner)
-		a = self.config['a'] # a-squares (outer two edge squares)
-		b = self.config['b'] # b-squares (inner two edge squares)
-		m = self.config['m'] # m-squares (middle 4x4)
-		t = self.config['t'] # t-squares (between middle 4x4 and edge)
-
-		self.matrix = [
-			[r, c, a, b, b, a, c, r],
-			[c, x, t, t, t, t, x, c],
-			[a, t, m, m, m, m, t, a],
-			[b, t, m, m, m, m, t, b],
-			[b, t, m, m, m, m, t, b],
-			[a, t, m, m, m, m, t, a],
-			[c, x, t, t, t, t, x, c],
-			[r, c, a, b, b, a, c, r]
-		]
+		self.matrix = [[self.config[letter] for letter in row] for row in SQUARE_CLASSES]
+		# the same values by square index (static move ordering)
+		self.squareValues = [self.matrix[sq >> 3][sq & 7] for sq in range(64)]
+		# the squares and value of each class, so bitboards can be scored a class at a time
+		self.classMasks = [sum([1 << sq for sq in range(64) if SQUARE_CLASSES[sq >> 3][sq & 7] == letter]) for letter in 'rcxabmt']
+		self.classValues = [self.config[letter] for letter in 'rcxabmt']
+
+		self.nodes = 0 # nodes visited by minimax, for reporting
+		# for the log only: leaves evaluated, beta cutoffs by the index of the move that caused them,
+		# and (depth, seconds, nodes so far) as each iteration of the last deepen() completed
+		self.leaves = 0
+		self.cutoffs = [0] * 64
+		self.depths = []
+		# minimax raises SearchTimeout once clock() passes self.deadline, checked when self.nodes reaches self.nextCheck
+		# (see checkDeadline), with the nodes and clock() of the last check
+		self.nextCheck = 0
+		self.checkNodes = 0
+		self.checkTime = 0.0
+		self.pondered = None # (board, round, root, depth) of the last position pondered, with its deepest search
+		self.children = [Node(None, round) for round in range(TOTAL_MOVES + 2)] # the reused child node for each round
+
+		# move ordering state (see order())
+		self.rootRound = 0
+		self.pv = []
+		self.killers = [[-1, -1] for ply in range(TOTAL_MOVES + 1)]
+		self.history = [None, [0] * 64, [0] * 64]
+		self.predicted = None # (board, round, line): where the last best line expected the game to be on our next move
+
+		self.table = None
+		if self.config['transpositionTableSize'] > 0:
+			self.table = TranspositionTable(self.config['transpositionTableSize'], self.config['transpositionPolicy'])
+
+		if self.config['bitboard']:
+			self.useBitboard(True)
+			self.heuristic = self.bitboardHeuristic
+
+		self.evaluator = None
+		if self.config['patterns'] is not None:
+			if self.config['batchLeaves']:
+				raise ValueError('batchLeaves evaluates the heuristic, not pattern tables')
+			self.evaluator = PatternEvaluator(self, self.config['patterns'])
+			self.heuristic = self.evaluator.evaluate
+		elif self.config['incrementalEval']:
+			self.evaluator = Evaluator(self)
+			self.heuristic = self.evaluator.evaluate
+
+		self.batch = None
+		if self.config['batchLeaves']:
+			# numpy is only needed for this
+			from BatchEvaluator import BatchEvaluator
+			self.batch = BatchEvaluator(self)
+
+		self.endgame = None
+		if self.config['endgameEmpties'] > 0:
+			self.endgame = Endgame()
+
+		# the pool is started on the first move (see parallelRoot)
+		self.pool = None
+		self.alpha = None
+
+		self.log = None
+		if self.config['log'] is not None:
+			self.log = SearchLog(self.config['log'])
+			self.instrument()
+
+	# count leaves and cutoffs for the log by wrapping the methods that see them,
+	# so the search itself is the same code with or without a log
+	def instrument(self):
+		heuristic = self.heuristic
+		minimaxLeaves = self.minimaxLeaves
+		order = self.order
+		cutoff = self.cutoff
+		ordered = [NO_LINE] * (TOTAL_MOVES + 2) # the moves of the node being searched in each round, in search order
+
+		def countLeaf(node):
+			self.leaves += 1
+			return heuristic(node)
+
+		def countLeaves(node, moves, player, alpha, beta):
+			self.leaves += len(moves)
+			return minimaxLeaves(node, moves, player, alpha, beta)
+
+		def keepOrder(node, moves, hint, player):
+			moves = order(node, moves, hint, player)
+			ordered[node.round] = moves
+			return moves
+
+		def countCutoff(node, sq, player):
+			moves = ordered[node.round]
+			for i in range(len(moves)):
+				if moves[i][0]*8 + moves[i][1] == sq:
+					self.cutoffs[i] += 1
+					break
+			cutoff(node, sq, player)
+
+		self.heuristic = countLeaf
+		self.minimaxLeaves = countLeaves
+		self.order = keepOrder
+		self.cutoff = countCutoff
 
 	# evaluate a given board state
 	# calculated on a zero-sum basis, positive is me, negative is opponent
@@ -175,33 +260,65 @@ class SmartAI(AI):
 				elif node.state[i][j] == self.opp:
 					oppFrontier += 1
 
+		# mobility, calculated relatively to opponent with value from -1 to 1
+		myMobility = len(self.getValidMoves(node.state, node.round, self.me))
+		oppMobility = len(self.getValidMoves(node.state, node.round, self.opp))
+
+		# stability: stable discs cannot be flipped
+		board = bitboard.fromState(node.state)
+		(myStability, oppStability) = stability.counts(board[self.me], board[self.opp])
+
+		return self.weigh(positionalScore, myFrontier, oppFrontier, myMobility, oppMobility, myStability, oppStability)
+
+	# same evaluation as heuristic, on a bitboard state
+	def bitboardHeuristic(self, node):
+		me = node.state[self.me]
+		opp = node.state[self.opp]
+
+		pivotTurn = 10
+		if TOTAL_MOVES - node.round < pivotTurn:
+			myScore = bitboard.popcount(me)
+			oppScore = bitboard.popcount(opp)
+			return 2.0 * (float(myScore) / (myScore + oppScore) - 0.5)
+
+		positionalScore = self.positionalScore([bitboard.popcount(me & squares) - bitboard.popcount(opp & squares) for squares in self.classMasks])
+		if node.max:
+			positionalScore += self.matrix[node.row][node.col]
+		else:
+			positionalScore -= self.matrix[node.row][node.col]
+
+		empty = ~(me | opp) & bitboard.FULL
+		myFrontier = bitboard.popcount(bitboard.frontier(me, empty))
+		oppFrontier = bitboard.popcount(bitboard.frontier(opp, empty))
+
+		myMobility = bitboard.popcount(bitboard.validMask(me, opp, node.round))
+		oppMobility = bitboard.popcount(bitboard.validMask(opp, me, node.round))
+
+		(myStability, oppStability) = stability.counts(me, opp)
+
+		return self.weigh(positionalScore, myFrontier, oppFrontier, myMobility, oppMobility, myStability, oppStability)
+
+	# positional score from how many more squares of each class (in self.classMasks order) I hold than the opponent
+	def positionalScore(self, counts):
+		values = self.classValues
+		score = 0
+		for i in range(len(counts)):
+			score += counts[i] * values[i]
+		return score
+
+	# combine the heuristic terms into a single score
+	def weigh(self, positionalScore, myFrontier, oppFrontier, myMobility, oppMobility, myStability, oppStability):
 		if myFrontier + oppFrontier == 0:
 			frontierScore = 0
 		else:
 			# we want the opponent to have a big frontier
 			frontierScore = 2.0 * (float(oppFrontier) / (myFrontier + oppFrontier) - 0.5)
 
-		# mobility, calculated relatively to opponent with value from -1 to 1
-		myMobility = len(self.getValidMoves(node.state, node.round, self.me))
-		oppMobility = len(self.getValidMoves(node.state, node.round, self.opp))
-
 		if myMobility + oppMobility == 0:
 			mobilityScore = 0
 		else:
 			mobilityScore = 2.0 * (float(myMobility) / (myMobility + oppMobility) - 0.5)
 
-		# stability
-		myStability = 0
-		oppStability = 0
-
-		# stable discs cannot be flipped
-		for (i, j) in cross(range(0, 8), range(0, 8)):
-			stablePlayer = stable(node.state, i, j)
-			if stablePlayer == self.me:
-				myStability += 1
-			if stablePlayer == self.opp:
-				oppStability += 1
-
 		if myStability + oppStability == 0:
 			stabilityScore = 0
 		else:
@@ -222,101 +339,382 @@ class SmartAI(AI):
 
 		return score
 
+	# count nodes toward deadline checks from now, with the first check after the next node
+	def startChecks(self):
+		self.nextCheck = self.nodes + 1
+		self.checkNodes = self.nodes
+		self.checkTime = self.clock()
+
+	# raise SearchTimeout if the deadline has passed, and set when to check next: after the nodes that should take
+	# checkSeconds at the rate since the last check (at most twice as many as then, so a slow patch is not missed),
+	# so a search stops soon after its deadline whether a node takes a microsecond (bitboards) or a millisecond (lists)
+	def checkDeadline(self):
+		now = self.clock()
+		if self.deadline is not None and now > self.deadline:
+			raise SearchTimeout()
+		nodes = self.nodes - self.checkNodes
+		elapsed = now - self.checkTime
+		interval = 2 * nodes
+		if elapsed > 0:
+			interval = min(interval, int(nodes * self.config['checkSeconds'] / elapsed))
+		self.nextCheck = self.nodes + max(interval, 1)
+		self.checkNodes = self.nodes
+		self.checkTime = now
+
 	# explore a node using minimax adversarial search with limited depth and a heuristic function
+	# moves are made and unmade on node.state, and every round has one child Node that is reused for each sibling,
+	# so nothing is copied per node; sets node.value, node.move (best square) and node.pv, and returns node
 	def minimax(self, node):
 		if TOTAL_MOVES - node.round == 0:
-			node.value = winner(node.state)
+			node.value = winner(self.countScore(node.state, self.me), self.countScore(node.state, self.opp))
 			return node
 
+		self.nodes += 1
+		if self.nodes >= self.nextCheck:
+			self.checkDeadline()
+
 		if node.depth == 0:
 			node.value = self.heuristic(node)
 			return node
 
-		children = []
-		if node.max:
-			validMoves = self.getValidMoves(node.state, node.round, self.me)
-
-			for move in validMoves:
-				newState = self.simMove(node.state, node.round, self.me, move[0], move[1])
-				child = Node(
-					newState,
-					node.round + 1,
-					row=move[0],
-					col=move[1],
-					depth=(node.depth - 1),
-					max=False,
-					alpha=node.alpha,
-					beta=node.beta
-				)
-				# children.append((-self.heuristic(child), child))
-				children.append(child)
-
-			best = None
-			# heapq.heapify(children)
-
-			while len(children) > 0:
-				# child = heapq.heappop(children)[1]
-				child = children.pop()
-				child.value = self.minimax(child).value
-				if best == None or child.value > best.value:
-					best = child
-				node.alpha = max(node.alpha, child.value)
-				if node.beta <= node.alpha:
-					break
+		# previously searched positions can cut off the search, or at least tell us which move to try first
+		table = self.table
+		hint = -1
+		if table is not None:
+			entry = table.probe(node.hash)
+			if entry is not None:
+				hint = entry[4]
+				if entry[1] >= node.depth and node.row != -1:
+					if entry[2] == EXACT:
+						node.value = entry[3]
+						return node
+					elif entry[2] == LOWER:
+						node.alpha = max(node.alpha, entry[3])
+					else:
+						node.beta = min(node.beta, entry[3])
+					if node.beta <= node.alpha:
+						node.value = entry[3]
+						return node
+		alpha = node.alpha
+		beta = node.beta
+
+		player = self.me if node.max else self.opp
+		validMoves = self.getValidMoves(node.state, node.round, player)
+		if len(validMoves) == 0:
+			if len(self.getValidMoves(node.state, node.round, 3-player)) > 0:
+				# pass
+				node.max = not node.max
+				node.hash ^= SIDE_KEY
+				return self.minimax(node)
+			node.value = winner(self.countScore(node.state, self.me), self.countScore(node.state, self.opp))
+			return node
 
-			if len(validMoves) > 0:
-				node.value = best.value
-				return best
+		if node.row == -1 and self.config['symmetry']:
+			validMoves = symmetry.uniqueMoves(node.state, validMoves)
+		validMoves = self.order(node, validMoves, hint, player)
+		if node.depth == 1 and self.batch is not None and node.round + 1 < TOTAL_MOVES:
+			return self.minimaxLeaves(node, validMoves, player, alpha, beta)
+		pvMove = -1
+		if node.onPV and node.round - self.rootRound < len(self.pv):
+			pvMove = self.pv[node.round - self.rootRound]
+
+		state = node.state
+		child = self.children[node.round + 1]
+		best = -1
+		bestValue = None
+		bestLine = None
+		for move in validMoves:
+			sq = move[0]*8 + move[1]
+			flipped = self.makeMove(state, node.round, player, move[0], move[1])
+			child.state = state
+			child.round = node.round + 1
+			child.row = move[0]
+			child.col = move[1]
+			child.depth = node.depth - 1
+			child.max = not node.max
+			child.alpha = node.alpha
+			child.beta = node.beta
+			child.pv = NO_LINE
+			child.onPV = sq == pvMove
+			if table is not None:
+				child.hash = hashMove(node.hash, player, move[0], move[1], flipped)
+			if self.evaluator is not None:
+				child.terms = self.evaluator.play(node.terms, player, move[0], move[1], flipped)
+			value = self.minimax(child).value
+			self.unmakeMove(state)
+
+			if node.max:
+				if best == -1 or value > bestValue:
+					best = sq
+					bestValue = value
+					bestLine = child.pv
+				node.alpha = max(node.alpha, value)
 			else:
-				oppValidMoves = self.getValidMoves(node.state, node.round, self.opp)
-				if len(oppValidMoves) > 0:
-					node.max = False
-					return self.minimax(node)
-				else:
-					node.value = winner(node.state)
-					return node
-
-		else:
-			validMoves = self.getValidMoves(node.state, node.round, self.opp)
-			for move in validMoves:
-				newState = self.simMove(node.state, node.round, self.opp, move[0], move[1])
-				child = Node(
-					newState,
-					node.round + 1,
-					row=move[0],
-					col=move[1],
-					depth=(node.depth - 1),
-					max=True,
-					alpha=node.alpha,
-					beta=node.beta
-				)
-				# children.append((self.heuristic(child), child))
-				children.append(child)
-
-			best = None
-			# heapq.heapify(children)
-
-			while len(children) > 0:
-				# child = heapq.heappop(children)[1]
-				child = children.pop()
-				child.value = self.minimax(child).value
-				if best == None or child.value < best.value:
-					best = child
-				node.beta = min(node.beta, child.value)
-				if node.beta <= node.alpha:
-					break
+				if best == -1 or value < bestValue:
+					best = sq
+					bestValue = value
+					bestLine = child.pv
+				node.beta = min(node.beta, value)
+			if node.row == -1 and (sq == pvMove or node.move != -1):
+				# the root keeps its best move so far, in case the search runs out of time (see move());
+				# it is only better than the last iteration's once that iteration's best move has been searched again
+				node.value = bestValue
+				node.move = best
+				node.pv = [best] + bestLine
+			if node.beta <= node.alpha:
+				self.cutoff(node, sq, player)
+				break
 
-			if len(validMoves) > 0:
-				node.value = best.value
-				return best
+		node.value = bestValue
+		node.move = best
+		node.pv = [best] + bestLine
+		self.remember(node, alpha, beta)
+		return node
+
+	# minimax for a node whose children are all leaves: score them in one batch, then pick as minimax would
+	# alpha and beta are the bounds the node was searched with
+	def minimaxLeaves(self, node, moves, player, alpha, beta):
+		board = node.state if self.bitboard else bitboard.fromState(node.state)
+		me = board[player]
+		opp = board[3-player]
+		mine = []
+		theirs = []
+		squares = []
+		for move in moves:
+			sq = move[0]*8 + move[1]
+			flipped = bitboard.flips(me, opp, sq)
+			squares.append(sq)
+			if player == self.me:
+				mine.append(me | flipped | (1 << sq))
+				theirs.append(opp & ~flipped)
 			else:
-				oppValidMoves = self.getValidMoves(node.state, node.round, self.me)
-				if len(oppValidMoves) > 0:
-					node.max = True
-					return self.minimax(node)
-				else:
-					node.value = winner(node.state)
-					return node
+				mine.append(opp & ~flipped)
+				theirs.append(me | flipped | (1 << sq))
+		values = self.batch.evaluate(mine, theirs, node.round + 1, not node.max, squares)
+		self.nodes += len(moves)
+
+		if self.config['crossCheck']:
+			for i in range(len(moves)):
+				leaf = Node([0, 0, 0], node.round + 1, moves[i][0], moves[i][1], depth=0, max=not node.max)
+				leaf.state[self.me] = mine[i]
+				leaf.state[self.opp] = theirs[i]
+				full = self.bitboardHeuristic(leaf)
+				if values[i] != full:
+					raise AssertionError('batch evaluation %r does not match full evaluation %r' % (values[i], full))
+
+		best = -1
+		bestValue = None
+		for i in range(len(moves)):
+			value = float(values[i])
+			if node.max:
+				if best == -1 or value > bestValue:
+					best = squares[i]
+					bestValue = value
+				node.alpha = max(node.alpha, value)
+			else:
+				if best == -1 or value < bestValue:
+					best = squares[i]
+					bestValue = value
+				node.beta = min(node.beta, value)
+			if node.beta <= node.alpha:
+				self.cutoff(node, squares[i], player)
+				break
+
+		node.value = bestValue
+		node.move = best
+		node.pv = [best]
+		self.remember(node, alpha, beta)
+		return node
+
+	# order moves so the most promising come first
+	# hint is the transposition table's best move for this node, or -1
+	def order(self, node, moves, hint, player):
+		if not self.config['moveOrdering']:
+			# last generated first, only bringing the hinted move forward
+			moves.reverse()
+			if hint != -1:
+				for i in range(len(moves)):
+					if moves[i][0]*8 + moves[i][1] == hint:
+						moves.insert(0, moves.pop(i))
+						break
+			return moves
+
+		# previous iteration's best line first, then killer moves for this ply, then by history and square value
+		ply = node.round - self.rootRound
+		if hint == -1 and node.onPV and ply < len(self.pv):
+			hint = self.pv[ply]
+		killers = self.killers[ply]
+		history = self.history[player]
+		rank = self.squareValues
+		moves.reverse() # ties keep the unordered search order
+		moves.sort(key=lambda move: (
+			move[0]*8 + move[1] == hint,
+			move[0]*8 + move[1] in killers,
+			history[move[0]*8 + move[1]],
+			rank[move[0]*8 + move[1]]
+		), reverse=True)
+		return moves
+
+	# remember a move that caused a beta cutoff, as a killer for its ply and in the history table
+	def cutoff(self, node, sq, player):
+		if not self.config['moveOrdering']:
+			return
+		killers = self.killers[node.round - self.rootRound]
+		if killers[0] != sq:
+			killers[1] = killers[0]
+			killers[0] = sq
+		self.history[player][sq] += node.depth * node.depth
+
+	# store a searched node in the transposition table; alpha and beta are the bounds it was searched with
+	def remember(self, node, alpha, beta):
+		if self.table is None:
+			return
+		if node.value <= alpha:
+			bound = UPPER
+		elif node.value >= beta:
+			bound = LOWER
+		else:
+			bound = EXACT
+		self.table.store(node.hash, node.depth, bound, node.value, node.move)
+
+	# node to start a search of the given depth from, with my turn to move
+	def root(self, state, round, depth):
+		node = Node(state, round, depth=depth)
+		node.onPV = True
+		if self.table is not None:
+			node.hash = hashState(state)
+		if self.evaluator is not None:
+			node.terms = self.evaluator.start(state)
+		return node
+
+	# search the position after I play move from a root position of the given depth, with alpha as the bound
+	# (the parallel search's root moves, in this process and in the workers); returns the child node
+	def searchMove(self, state, round, move, depth, alpha=-float('inf')):
+		root = self.root(state, round, depth)
+		sq = move[0]*8 + move[1]
+		flipped = self.makeMove(state, round, self.me, move[0], move[1])
+		child = self.children[round + 1]
+		child.state = state
+		child.round = round + 1
+		child.row = move[0]
+		child.col = move[1]
+		child.depth = depth - 1
+		child.max = False
+		child.alpha = alpha
+		child.beta = float('inf')
+		child.pv = NO_LINE
+		child.onPV = len(self.pv) > 0 and self.pv[0] == sq
+		if self.table is not None:
+			child.hash = hashMove(root.hash, self.me, move[0], move[1], flipped)
+		if self.evaluator is not None:
+			child.terms = self.evaluator.play(root.terms, self.me, move[0], move[1], flipped)
+		self.minimax(child)
+		self.unmakeMove(state)
+		return child
+
+	# one iteration of parallel search from a root node: the first root move is searched here to get a bound,
+	# then the others are handed to the worker pool, whose workers share the best value found so far as alpha
+	# raises SearchTimeout if any move could not be searched by the deadline, with the best so far left in root
+	def parallelRoot(self, root):
+		if self.pool is None:
+			(self.pool, self.alpha) = workerPool(self.me, self.config)
+
+		(state, round, depth) = (root.state, root.round, root.depth)
+		hint = self.pv[0] if len(self.pv) > 0 else -1
+		moves = self.getValidMoves(state, round, self.me)
+		if self.config['symmetry']:
+			moves = symmetry.uniqueMoves(state, moves)
+		moves = self.order(root, moves, hint, self.me)
+
+		move = moves[0]
+		child = self.searchMove(state, round, move, depth)
+		root.value = child.value
+		root.move = move[0]*8 + move[1]
+		root.pv = [root.move] + child.pv
+		self.alpha.value = root.value
+
+		timedOut = False
+		jobs = [(state, round, move, depth, self.pv, self.deadline) for move in moves[1:]]
+		for (move, value, line, nodes) in self.pool.imap_unordered(_searchMove, jobs):
+			self.nodes += nodes
+			if value is None:
+				timedOut = True
+			# moves that did not beat alpha only return a bound, which is never better than the best so far
+			elif value > root.value:
+				root.value = value
+				root.move = move[0]*8 + move[1]
+				root.pv = [root.move] + line
+		# the workers' nodes say nothing about how fast this process searches
+		self.startChecks()
+		if timedOut:
+			raise SearchTimeout()
+		return root
+
+	# reset the search state (move ordering, table age) for a search from the given round
+	# line is the best line expected from this position, if the previous search predicted it
+	def newSearch(self, round, line=None):
+		if self.table is not None:
+			self.table.newSearch()
+		shift = round - self.rootRound
+		if line and shift > 0:
+			# the killers for each ply below the old root are the killers for the same ply below this one
+			self.killers = (self.killers[shift:] + [[-1, -1] for ply in range(shift)])[:TOTAL_MOVES + 1]
+			self.pv = line
+		else:
+			# no line, or one from a position no later than the last search's root, whose killers are for other plies
+			self.pv = line or []
+			self.killers = [[-1, -1] for ply in range(TOTAL_MOVES + 1)]
+		self.rootRound = round
+		# keep what the history table learned last move, but let this move's cutoffs dominate
+		for player in (1, 2):
+			self.history[player] = [value / 2 for value in self.history[player]]
+
+	# remember where a best line from a (list-of-lists) state expects the game to be on our next move:
+	# after our move and the opponent's reply
+	def predict(self, state, round, line):
+		self.predicted = None
+		if len(line) < 3:
+			return
+		board = bitboard.fromState(state)
+		for (player, sq) in ((self.me, line[0]), (self.opp, line[1])):
+			flipped = bitboard.flips(board[player], board[3-player], sq)
+			if not flipped:
+				return # not a move (the line passes)
+			board[player] |= flipped | (1 << sq)
+			board[3-player] &= ~flipped
+		self.predicted = (board, round + 2, line[2:])
+
+	# the rest of the predicted line, if the game reached the predicted position
+	def expectedLine(self, state, round):
+		if not self.config['reuse'] or self.predicted is None:
+			return None
+		(board, predictedRound, line) = self.predicted
+		if round != predictedRound or board != bitboard.fromState(state):
+			return None
+		return list(line)
+
+	# the move the endgame solver finds from a bitboard by the deadline (by self.clock), or None
+	def solve(self, board, deadline):
+		startTime = self.clock()
+		result = self.endgame.solve(board[self.me], board[self.opp], self.config['endgameExact'], deadline, self.clock)
+		elapsed = self.clock() - startTime
+		if result is None:
+			print 'The endgame solver ran out of time after %f seconds (%d nodes), searching instead' % (elapsed, self.endgame.nodes)
+			return None
+
+		(sq, score) = result
+		if self.log is not None:
+			self.log.write({'ai': 'smart', 'player': self.me, 'empties': 64 - bitboard.popcount(board[1] | board[2]),
+				'endgame': True, 'exact': self.config['endgameExact'], 'seconds': elapsed, 'nodes': self.endgame.nodes,
+				'move': [sq >> 3, sq & 7], 'score': score})
+		if self.config['endgameExact']:
+			print 'Solved the endgame in %f seconds: final disc difference %d' % (elapsed, score)
+		else:
+			print 'Solved the endgame in %f seconds: %s' % (elapsed, 'win' if score > 0 else 'loss' if score < 0 else 'draw')
+		print 'Searched %d nodes' % self.endgame.nodes
+		print ''
+		self.predicted = None
+		return [sq >> 3, sq & 7]
 
 	# increase time toward the midgame, decrease toward the endgame
 	def distribution(self, round):
@@ -324,9 +722,12 @@ class SmartAI(AI):
 
 	# get move (uses minimax)
 	def move(self, **kwargs):
-		startTime = time.clock()
+		# the parallel search waits on its workers, so it has to go by wall time rather than this process's time
+		parallel = self.config['workers'] > 1
+		self.clock = time.time if parallel else time.clock
+		startTime = self.clock()
 
-		state = kwargs['state']
+		state = self.fromState(kwargs['state'])
 		round = kwargs['round']
 
 		myTimer = kwargs['t1'] if self.me == 1 else kwargs['t2']
@@ -335,22 +736,165 @@ class SmartAI(AI):
 		myTimePerTurn *= self.distribution(round) # spend shorter in the beginning and endgame, longer in the midgame
 		print 'I can spend %f this turn' % (myTimePerTurn)
 
-		estimated_factor = self.config['timeFactor'] # i.e. it takes us x times as long to go one more depth
-		depth = 0
-		while depth < TOTAL_MOVES - round:
-			depth += 1
-			moveNode = self.minimax(Node(state, round, depth=depth))
-
-			elapsed = time.clock() - startTime
-			if elapsed * estimated_factor > myTimePerTurn:
-				break
+		# the search pondered on the opponent's time is only any use to this move, however it is made
+		pondered = self.pondered
+		self.pondered = None
+
+		if self.endgame is not None:
+			board = bitboard.fromState(kwargs['state'])
+			if TOTAL_MOVES - bitboard.popcount(board[1] | board[2]) <= self.config['endgameEmpties']:
+				# leave half the turn to search in case the solver does not finish
+				move = self.solve(board, startTime + myTimePerTurn / 2)
+				if move is not None:
+					return move
+
+		self.deadline = startTime + myTimePerTurn
+		fromPonder = pondered is not None and pondered[0] == bitboard.fromState(kwargs['state']) and pondered[1] == round
+		if fromPonder:
+			# carry on from the search made on the opponent's time
+			(best, depth) = pondered[2:]
+			print 'Pondered this position to depth %d' % depth
+			self.pv = best.pv
+		else:
+			self.newSearch(round, self.expectedLine(kwargs['state'], round))
+			(best, depth) = (None, 0)
+		(best, depth) = self.deepen(state, round, best, depth, parallel)
+		self.deadline = None
+		elapsed = self.clock() - startTime
+		if self.log is not None:
+			self.logSearch(round, myTimePerTurn, elapsed, best, depth, fromPonder)
+
+		if best is None:
+			# not even the first iteration finished
+			print 'Out of time before finishing depth 1'
+			self.predicted = None
+			return self.getValidMoves(state, round, self.me)[0]
 
 		if depth == TOTAL_MOVES - round:
 			print 'Exhausted the entire tree in %f seconds' % (elapsed)
 		else:
 			print 'Calling it quits! Got to depth %d in %f seconds' % (depth, elapsed)
 
-		print 'Move Heuristic Value: %s' % moveNode.value
+		print 'Searched %d nodes' % self.nodes
+		print 'Move Heuristic Value: %s' % best.value
+		self.predict(kwargs['state'], round, best.pv)
 
 		print ''
-		return [moveNode.row, moveNode.col]
+		return [best.move >> 3, best.move & 7]
+
+	# iterative deepening from state after the completed iteration (root node best, of the given depth, or None and 0),
+	# until the tree is exhausted or the deadline interrupts an iteration
+	# returns the root of the deepest completed iteration (or of a partial one that improved on it), and its depth
+	def deepen(self, state, round, best, depth, parallel):
+		self.nodes = 0
+		self.startChecks()
+		if self.log is not None:
+			self.leaves = 0
+			self.cutoffs = [0] * 64
+			self.depths = []
+			startTime = self.clock()
+		mark = self.undoTop
+		try:
+			while depth < TOTAL_MOVES - round:
+				root = self.root(state, round, depth + 1)
+				if parallel:
+					self.parallelRoot(root)
+				else:
+					self.minimax(root)
+				depth += 1
+				best = root
+				self.pv = root.pv
+				if self.log is not None:
+					self.depths.append((depth, self.clock() - startTime, self.nodes))
+		except SearchTimeout:
+			# put the board back the way the interrupted search found it
+			self.unmakeTo(state, mark)
+			if root.move != -1:
+				best = root
+		return (best, depth)
+
+	# write a move's search (from move(): seconds spent of the budget, the root it chose, or None, and its depth) to the log
+	# a depth's branching factor is the nodes its iteration searched over the nodes the iteration before searched
+	# (in parallel searches, leaves and cutoffs only count the part of the search in this process)
+	def logSearch(self, round, budget, elapsed, best, depth, pondered):
+		depths = []
+		previous = 0
+		last = 0
+		for (iteration, seconds, nodes) in self.depths:
+			searched = nodes - last
+			depths.append({'depth': iteration, 'seconds': seconds, 'nodes': searched,
+				'branching': float(searched) / previous if previous > 0 else None})
+			previous = searched
+			last = nodes
+		cutoffs = self.cutoffs[:]
+		while len(cutoffs) > 0 and cutoffs[-1] == 0:
+			cutoffs.pop()
+		self.log.write({'ai': 'smart', 'player': self.me, 'round': round, 'budget': budget, 'seconds': elapsed,
+			'pondered': pondered, 'depth': depth,
+			'nodes': self.nodes, 'leaves': self.leaves, 'nodesPerSecond': self.nodes / max(elapsed, 1e-9),
+			'cutoffs': cutoffs, 'depths': depths,
+			'move': [best.move >> 3, best.move & 7] if best is not None else None,
+			'value': best.value if best is not None else None})
+
+	# search the position the last best line expects after the opponent's reply, until stopped
+	# (only a prediction from the last move's search, which is past its root, is any use)
+	def ponder(self, state, round):
+		if self.predicted is None or self.predicted[1] <= self.rootRound:
+			return
+		(board, round, line) = self.predicted
+		position = bitboard.toState(board)
+		self.newSearch(round, list(line))
+		# always in this process: worker jobs could not be interrupted once the opponent has moved
+		(best, depth) = self.deepen(self.fromState(position), round, None, 0, False)
+		if best is not None:
+			self.pondered = (board, round, best, depth)
+
+# worker pools for parallel search, one per player and config, started once and reused every move
+# each is (pool, alpha), where alpha is the best root value found so far in the current iteration, shared by all workers
+_pools = {}
+
+def workerPool(me, config):
+	key = (me, tuple(sorted(config.items())))
+	if key not in _pools:
+		alpha = multiprocessing.Value('d', -float('inf'))
+		pool = multiprocessing.Pool(config['workers'], initializer=_startWorker, initargs=(me, config, alpha))
+		_pools[key] = (pool, alpha)
+	return _pools[key]
+
+# state of a worker process: its own (serial) SmartAI, with its own transposition table and ordering tables
+_worker = None
+_alpha = None
+_round = None
+
+def _startWorker(me, config, alpha):
+	global _worker, _alpha
+	config = dict(config)
+	config['workers'] = 0
+	config['log'] = None
+	_worker = SmartAI(me, config)
+	_alpha = alpha
+
+# search one root move in a worker; job is (state, round, move, depth, pv, deadline),
+# returns (move, value, line, nodes), with value None if the move could not be searched by the deadline (wall time)
+def _searchMove(job):
+	global _round
+	(state, round, move, depth, pv, deadline) = job
+	if round != _round:
+		_worker.newSearch(round)
+		_round = round
+	_worker.pv = pv
+	_worker.nodes = 0
+	_worker.deadline = deadline
+	_worker.clock = time.time
+	_worker.startChecks()
+
+	mark = _worker.undoTop
+	try:
+		child = _worker.searchMove(state, round, move, depth, _alpha.value)
+	except SearchTimeout:
+		_worker.unmakeTo(state, mark)
+		return (move, None, None, _worker.nodes)
+	with _alpha.get_lock():
+		if child.value > _alpha.value:
+			_alpha.value = child.value
+	return (move, child.value, child.pv, _worker.nodes)
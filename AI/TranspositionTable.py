@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+import random
+
+import bitboard
+
+# zobrist keys, drawn from a fixed seed so hashes are the same in every process
+_random = random.Random(0x5eed)
+KEYS = [None] + [[_random.getrandbits(64) for sq in range(64)] for player in (1, 2)]
+SIDE_KEY = _random.getrandbits(64) # xored in when it is the opponent's turn
+
+# xor of the keys for every set bit of a byte, per player and row, so a whole row hashes in one lookup
+def _rowKeys(keys):
+	table = []
+	for row in range(8):
+		rowTable = [0] * 256
+		for byte in range(1, 256):
+			low = byte & -byte
+			rowTable[byte] = rowTable[byte ^ low] ^ keys[row*8 + low.bit_length() - 1]
+		table.append(rowTable)
+	return table
+ROW_KEYS = [None, _rowKeys(KEYS[1]), _rowKeys(KEYS[2])]
+# a flipped disc leaves one player and joins the other
+FLIP_KEYS = [[ROW_KEYS[1][row][byte] ^ ROW_KEYS[2][row][byte] for byte in range(256)] for row in range(8)]
+
+def hashBits(b, rowKeys):
+	hash = 0
+	row = 0
+	while b:
+		hash ^= rowKeys[row][b & 0xFF]
+		b >>= 8
+		row += 1
+	return hash
+
+# hash a position from scratch (list-of-lists or bitboard state)
+def hashState(state, myTurn=True):
+	if len(state) != 3:
+		state = bitboard.fromState(state)
+	hash = hashBits(state[1], ROW_KEYS[1]) ^ hashBits(state[2], ROW_KEYS[2])
+	return hash if myTurn else hash ^ SIDE_KEY
+
+# update a hash for player taking (row, col) and flipping the discs in the 'flipped' mask
+def hashMove(hash, player, row, col, flipped):
+	return hash ^ KEYS[player][row*8 + col] ^ hashBits(flipped, FLIP_KEYS) ^ SIDE_KEY
+
+# bound types
+EXACT = 0
+LOWER = 1	# the value is at least this (the search failed high)
+UPPER = 2	# the value is at most this (the search failed low)
+
+# replacement policies
+ALWAYS = 'always'	# a new entry always replaces the old one
+DEPTH = 'depth'		# keep the deeper entry, unless it was stored during an earlier move
+
+# fixed-size table of searched positions, indexed by the low bits of the zobrist hash
+# each entry is (hash, depth, bound, value, move, age), where move is a square index or -1
+class TranspositionTable(object):
+	def __init__(self, size, policy=DEPTH):
+		if policy not in (ALWAYS, DEPTH):
+			raise ValueError('Unknown replacement policy: %s' % policy)
+
+		# round down to a power of two so the index is a mask
+		self.size = 1
+		while self.size * 2 <= size:
+			self.size *= 2
+		self.mask = self.size - 1
+		self.entries = [None] * self.size
+		self.policy = policy
+		self.age = 0
+
+	# start searching a new move; entries from earlier moves become replaceable
+	def newSearch(self):
+		self.age += 1
+
+	def probe(self, hash):
+		entry = self.entries[hash & self.mask]
+		if entry is not None and entry[0] == hash:
+			return entry
+		return None
+
+	def store(self, hash, depth, bound, value, move):
+		index = hash & self.mask
+		old = self.entries[index]
+		if self.policy == DEPTH and old is not None and old[0] != hash and old[5] == self.age and old[1] > depth:
+			return
+		self.entries[index] = (hash, depth, bound, value, move, self.age)
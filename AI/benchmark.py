@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from NewAI import NewAI, MoveOption
+from SmartAI import SmartAI, Node
+import bitboard
+
+# positions reached by seeded random play, so every run searches the same boards
+def randomPosition(round, seed):
+	rng = random.Random(seed)
+	state = bitboard.fromState([[0 for y in range(8)] for x in range(8)])
+	player = 1
+	r = 0
+	while r < round:
+		moves = bitboard.moveList(bitboard.validMask(state[player], state[3-player], r))
+		if len(moves) == 0:
+			player = 3-player
+			continue
+		move = rng.choice(moves)
+		sq = bitboard.square(move[0], move[1])
+		flipped = bitboard.flips(state[player], state[3-player], sq)
+		state[player] |= flipped | (1 << sq)
+		state[3-player] &= ~flipped
+		player = 3-player
+		r += 1
+	return (bitboard.toState(state), r, player)
+
+POSITIONS = [randomPosition(round, seed) for (round, seed) in [(12, 1), (20, 2), (20, 3), (28, 4), (36, 5)]]
+
+# iterative deepening to a fixed depth on every position; returns (nodes, seconds)
+def searchNodes(config, depth):
+	nodes = 0
+	start = time.time()
+	for (state, round, player) in POSITIONS:
+		ai = SmartAI(player, config)
+		ai.nodes = 0
+		ai.newSearch(round)
+		board = ai.fromState(state)
+		for d in range(1, depth + 1):
+			root = ai.root(board, round, d)
+			ai.minimax(root)
+			ai.pv = root.pv
+		nodes += ai.nodes
+	return (nodes, time.time() - start)
+
+# deepest completed iteration on every position within a fixed time per position
+def searchDepths(config, seconds):
+	depths = []
+	for (state, round, player) in POSITIONS:
+		ai = SmartAI(player, config)
+		ai.newSearch(round)
+		board = ai.fromState(state)
+		start = time.time()
+		depth = 0
+		while depth < 64 - round:
+			root = ai.root(board, round, depth + 1)
+			ai.minimax(root)
+			if time.time() - start > seconds:
+				break
+			ai.pv = root.pv
+			depth += 1
+		depths.append(depth)
+	return depths
+
+def ordering(depth, seconds):
+	for (name, config) in [
+		('unordered', {'bitboard': True}),
+		('ordered', {'bitboard': True, 'moveOrdering': True}),
+		('ordered + table', {'bitboard': True, 'moveOrdering': True, 'transpositionTableSize': 1 << 18})
+	]:
+		(nodes, elapsed) = searchNodes(config, depth)
+		print '%-16s depth %d: %8d nodes in %6.2f seconds, depths reached in %.1f seconds: %s' % (
+			name, depth, nodes, elapsed, seconds, searchDepths(config, seconds))
+
+# the sibling leaves two plies below each position: (ai, round, max, [(mine, theirs, square)]) per parent
+def leafSets():
+	sets = []
+	for (state, round, player) in POSITIONS:
+		ai = SmartAI(player, {'bitboard': True})
+		board = ai.fromState(state)
+		for move in ai.getValidMoves(board, round, player):
+			ai.makeMove(board, round, player, move[0], move[1])
+			leaves = []
+			for reply in ai.getValidMoves(board, round + 1, 3-player):
+				ai.makeMove(board, round + 1, 3-player, reply[0], reply[1])
+				leaves.append((board[player], board[3-player], reply[0]*8 + reply[1]))
+				ai.unmakeMove(board)
+			ai.unmakeMove(board)
+			if len(leaves) > 0:
+				sets.append((ai, round + 2, True, leaves))
+	return sets
+
+# evaluations per second of the scalar heuristic and of the numpy batch evaluator, batching siblings or everything
+def leaves(repeat):
+	from BatchEvaluator import BatchEvaluator
+
+	sets = leafSets()
+	count = sum([len(leaves) for (ai, round, max, leaves) in sets]) * repeat
+
+	start = time.time()
+	for i in range(repeat):
+		for (ai, round, max, leaves) in sets:
+			for (mine, theirs, sq) in leaves:
+				node = Node([0, 0, 0], round, sq >> 3, sq & 7, depth=0, max=max)
+				node.state[ai.me] = mine
+				node.state[ai.opp] = theirs
+				ai.bitboardHeuristic(node)
+	print 'scalar:           %8.0f evaluations per second' % (count / (time.time() - start))
+
+	batches = [(BatchEvaluator(ai), round, max, leaves) for (ai, round, max, leaves) in sets]
+	start = time.time()
+	for i in range(repeat):
+		for (batch, round, max, leaves) in batches:
+			batch.evaluate([leaf[0] for leaf in leaves], [leaf[1] for leaf in leaves], round, max, [leaf[2] for leaf in leaves])
+	print 'batched siblings: %8.0f evaluations per second (%.1f leaves per batch)' % (count / (time.time() - start), float(count) / repeat / len(sets))
+
+	# every leaf in one batch (all sets share a round per position, so batch per position)
+	byPosition = {}
+	for (batch, round, max, leaves) in batches:
+		byPosition.setdefault((batch.ai.me, round), (batch, round, max, []))[3].extend(leaves * repeat)
+	start = time.time()
+	for (batch, round, max, leaves) in byPosition.values():
+		batch.evaluate([leaf[0] for leaf in leaves], [leaf[1] for leaf in leaves], round, max, [leaf[2] for leaf in leaves])
+	print 'one batch:        %8.0f evaluations per second' % (count / (time.time() - start))
+
+	for (name, config) in [
+		('scalar search', {'bitboard': True, 'moveOrdering': True}),
+		('batched search', {'bitboard': True, 'moveOrdering': True, 'batchLeaves': True})
+	]:
+		(nodes, elapsed) = searchNodes(config, 4)
+		print '%-16s depth 4: %8d nodes in %6.2f seconds' % (name, nodes, elapsed)
+
+# play a game from the start between two AIs (for players 1 and 2) with unlimited time; returns the winner, 0 for a draw
+def playGame(ais):
+	state = bitboard.fromState([[0 for y in range(8)] for x in range(8)])
+	player = 1
+	round = 0
+	quiet = open(os.devnull, 'w')
+	while True:
+		if bitboard.validMask(state[player], state[3-player], round) == 0:
+			player = 3-player
+			if bitboard.validMask(state[player], state[3-player], round) == 0:
+				break
+		stdout = sys.stdout
+		sys.stdout = quiet
+		try:
+			move = ais[player].move(state=bitboard.toState(state), round=round, t1=1e6, t2=1e6)
+		finally:
+			sys.stdout = stdout
+		sq = bitboard.square(move[0], move[1])
+		flipped = bitboard.flips(state[player], state[3-player], sq)
+		state[player] |= flipped | (1 << sq)
+		state[3-player] &= ~flipped
+		player = 3-player
+		round += 1
+	quiet.close()
+
+	scores = [0, bitboard.popcount(state[1]), bitboard.popcount(state[2])]
+	if scores[1] == scores[2]:
+		return 0
+	return 1 if scores[1] > scores[2] else 2
+
+# uct against flat monte carlo with the same number of playouts per move, each taking both colours in turn
+def mcts(games, iterations):
+	flat = {'bitboard': True, 'maxIterations': iterations}
+	uct = {'bitboard': True, 'maxIterations': iterations, 'search': 'uct'}
+	results = [0, 0, 0] # draws, uct wins, flat wins
+	start = time.time()
+	for game in range(games):
+		uctPlayer = 1 + game % 2
+		ais = [None, None, None]
+		ais[uctPlayer] = NewAI(uctPlayer, uct)
+		ais[3-uctPlayer] = NewAI(3-uctPlayer, flat)
+		winner = playGame(ais)
+		if winner == 0:
+			results[0] += 1
+		else:
+			results[1 if winner == uctPlayer else 2] += 1
+	print 'uct against flat, %d playouts per move option: %d wins, %d losses, %d draws in %.1f seconds' % (
+		iterations, results[1], results[2], results[0], time.time() - start)
+
+# leaf positions depth moves below state (a pass counts as a move, and a finished game as a leaf)
+def perft(ai, state, round, player, depth):
+	if depth == 0:
+		return 1
+	moves = ai.getValidMoves(state, round, player)
+	if len(moves) == 0:
+		if len(ai.getValidMoves(state, round, 3-player)) == 0:
+			return 1
+		return perft(ai, state, round, 3-player, depth - 1)
+	if depth == 1:
+		return len(moves)
+	count = 0
+	for move in moves:
+		ai.makeMove(state, round, player, move[0], move[1])
+		count += perft(ai, state, round + 1, 3-player, depth - 1)
+		ai.unmakeMove(state)
+	return count
+
+# the usual starting position, which the players reach by round 4, with the published perft counts by depth
+START = ([[0]*8, [0]*8, [0]*8, [0, 0, 0, 2, 1, 0, 0, 0], [0, 0, 0, 1, 2, 0, 0, 0], [0]*8, [0]*8, [0]*8], 4, 1)
+START_PERFT = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288]
+
+# perft to depth from the empty board, the usual start and the search positions, on both board backends
+# every count is checked against the other backend's, and the start's against the published ones
+def perftResults(depth):
+	results = []
+	empty = ([[0 for y in range(8)] for x in range(8)], 0, 1)
+	for (name, (state, round, player)) in [('empty', empty), ('start', START)] + [('position %d' % i, POSITIONS[i]) for i in range(len(POSITIONS))]:
+		counts = {}
+		for backend in ['list', 'bitboard']:
+			ai = SmartAI(player, {'bitboard': backend == 'bitboard'})
+			board = ai.fromState(state)
+			start = time.time()
+			counts[backend] = perft(ai, board, round, player, depth)
+			elapsed = time.time() - start
+			results.append({'position': name, 'backend': backend, 'depth': depth, 'leaves': counts[backend],
+				'seconds': elapsed, 'leavesPerSecond': counts[backend] / max(elapsed, 1e-9)})
+		correct = counts['list'] == counts['bitboard']
+		if name == 'start' and depth < len(START_PERFT):
+			correct = correct and counts['list'] == START_PERFT[depth]
+		for result in results[-2:]:
+			result['correct'] = correct
+	return results
+
+# fixed depth iterative deepening on every search position, with the time each depth was reached
+def searchResults(config, depth):
+	results = []
+	for i in range(len(POSITIONS)):
+		(state, round, player) = POSITIONS[i]
+		ai = SmartAI(player, config)
+		ai.nodes = 0
+		ai.newSearch(round)
+		board = ai.fromState(state)
+		start = time.time()
+		depthSeconds = []
+		for d in range(1, depth + 1):
+			root = ai.root(board, round, d)
+			ai.minimax(root)
+			ai.pv = root.pv
+			depthSeconds.append(time.time() - start)
+		elapsed = time.time() - start
+		results.append({'position': 'position %d' % i, 'config': config, 'depth': depth, 'nodes': ai.nodes,
+			'seconds': elapsed, 'nodesPerSecond': ai.nodes / max(elapsed, 1e-9), 'depthSeconds': depthSeconds,
+			'move': root.move, 'value': root.value})
+	return results
+
+# a fixed number of playouts from every root move of every search position
+def playoutResults(config, iterations):
+	results = []
+	for i in range(len(POSITIONS)):
+		(state, round, player) = POSITIONS[i]
+		ai = NewAI(player, config)
+		random.seed(i)
+		options = [MoveOption(move) for move in ai.getValidMoves(ai.fromState(state), round, player)]
+		start = time.time()
+		ai.playouts(state, round, options, float('inf'), iterations)
+		elapsed = time.time() - start
+		count = sum([option.attempts for option in options])
+		results.append({'position': 'position %d' % i, 'config': config, 'playouts': count,
+			'seconds': elapsed, 'playoutsPerSecond': count / max(elapsed, 1e-9)})
+	return results
+
+# the whole suite, as a dict that json can write out
+def suite(perftDepth, searchDepth, iterations):
+	return {
+		'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+		'python': platform.python_version(),
+		'machine': platform.machine(),
+		'perft': perftResults(perftDepth),
+		'search': searchResults({'bitboard': False}, searchDepth) +
+			searchResults({'bitboard': True, 'moveOrdering': True, 'transpositionTableSize': 1 << 18}, searchDepth),
+		'playouts': playoutResults({'bitboard': False}, iterations) + playoutResults({'bitboard': True}, iterations) +
+			playoutResults({'bitboard': True, 'batchPlayouts': iterations}, iterations)
+	}
+
+# call: python benchmark.py ordering [depth] [seconds]
+#       python benchmark.py leaves [repeat]
+#       python benchmark.py mcts [games] [iterations]
+#       python benchmark.py suite [path] [perft depth] [search depth] [iterations]
+#         writes the perft, search and playout benchmarks as json to path (- for stdout)
+if __name__ == '__main__':
+	if len(sys.argv) < 2:
+		print 'USAGE: python benchmark.py ordering [depth] [seconds]'
+		print '       python benchmark.py leaves [repeat]'
+		print '       python benchmark.py mcts [games] [iterations]'
+		print '       python benchmark.py suite [path] [perft depth] [search depth] [iterations]'
+		sys.exit()
+
+	if sys.argv[1] == 'ordering':
+		depth = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+		seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+		ordering(depth, seconds)
+	elif sys.argv[1] == 'leaves':
+		leaves(int(sys.argv[2]) if len(sys.argv) > 2 else 5)
+	elif sys.argv[1] == 'mcts':
+		games = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+		iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+		mcts(games, iterations)
+	elif sys.argv[1] == 'suite':
+		path = sys.argv[2] if len(sys.argv) > 2 else '-'
+		perftDepth = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+		searchDepth = int(sys.argv[4]) if len(sys.argv) > 4 else 5
+		iterations = int(sys.argv[5]) if len(sys.argv) > 5 else 20
+		results = suite(perftDepth, searchDepth, iterations)
+		if path == '-':
+			print json.dumps(results, indent=1)
+		else:
+			with open(path, 'w') as file:
+				json.dump(results, file, indent=1)
+	else:
+		print 'Unknown benchmark: %s' % sys.argv[1]
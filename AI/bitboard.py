@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+
+# bitboard board representation
+# a board is a list indexed by player number (like the values of the list-of-lists state),
+# holding a 64-bit integer of that player's discs; slot 0 is unused
+# square (row, col) is bit row*8 + col
+
+FULL = 0xFFFFFFFFFFFFFFFF
+NOT_COL_0 = 0xFEFEFEFEFEFEFEFE	# every square except the first column
+NOT_COL_7 = 0x7F7F7F7F7F7F7F7F	# every square except the last column
+CENTER = (1 << 27) | (1 << 28) | (1 << 35) | (1 << 36)
+
+# (shift, mask) for each direction; the mask drops squares that wrapped around a row
+# left shifts move toward higher squares (down / right), right shifts toward lower squares
+LEFT_SHIFTS = ((1, NOT_COL_0), (8, FULL), (9, NOT_COL_0), (7, NOT_COL_7))
+RIGHT_SHIFTS = ((1, NOT_COL_7), (8, FULL), (9, NOT_COL_7), (7, NOT_COL_0))
+
+# (dx, dy) as used by AI.checkDirection -> (shift, mask), with negative shifts going right
+DIRECTIONS = {
+	(0, 1): (1, NOT_COL_0),
+	(0, -1): (-1, NOT_COL_7),
+	(1, 0): (8, FULL),
+	(-1, 0): (-8, FULL),
+	(1, 1): (9, NOT_COL_0),
+	(-1, -1): (-9, NOT_COL_7),
+	(1, -1): (7, NOT_COL_7),
+	(-1, 1): (-7, NOT_COL_0)
+}
+
+def square(row, col):
+	return row*8 + col
+
+def shift(b, s, mask):
+	if s > 0:
+		return (b << s) & mask
+	return (b >> -s) & mask
+
+# number of set bits
+def popcount(b):
+	return bin(b).count('1')
+
+# iterate the square indices of the set bits, lowest first (the same row-major order as the list board)
+def squares(b):
+	while b:
+		low = b & -b
+		yield low.bit_length() - 1
+		b ^= low
+
+# [row, col] moves for every occupancy byte of every row, so move lists can be built a row at a time
+# (the [row, col] lists are shared, callers must not modify them)
+ROW_SQUARES = [[[[row, col] for col in range(8) if byte & (1 << col)] for byte in range(256)] for row in range(8)]
+
+# the set bits of b as [row, col] moves, in row-major order
+def moveList(b):
+	moves = []
+	row = 0
+	while b:
+		byte = b & 0xFF
+		if byte:
+			moves.extend(ROW_SQUARES[row][byte])
+		b >>= 8
+		row += 1
+	return moves
+
+# convert a list-of-lists state to a bitboard
+def fromState(state):
+	board = [0, 0, 0]
+	bit = 1
+	for i in range(8):
+		for j in range(8):
+			if state[i][j]:
+				board[state[i][j]] |= bit
+			bit <<= 1
+	return board
+
+# convert a bitboard back to a list-of-lists state
+def toState(board):
+	state = [[0 for y in range(8)] for x in range(8)]
+	for player in (1, 2):
+		for sq in squares(board[player]):
+			state[sq >> 3][sq & 7] = player
+	return state
+
+# all squares adjacent to any square of b
+def neighbours(b):
+	result = 0
+	for s, mask in LEFT_SHIFTS:
+		result |= (b << s) & mask
+	for s, mask in RIGHT_SHIFTS:
+		result |= (b >> s) & mask
+	return result
+
+# squares where the player owning 'me' may play against 'opp'
+# each direction fills runs of opponent discs away from our discs, two squares at a time after the first
+def moveMask(me, opp):
+	empty = ~(me | opp) & FULL
+	inner = opp & 0x7E7E7E7E7E7E7E7E	# opponent discs off the side columns, so horizontal fills cannot wrap
+
+	# horizontal
+	t = inner & (me << 1); t |= inner & (t << 1); p = inner & (inner << 1); t |= p & (t << 2); t |= p & (t << 2)
+	moves = t << 1
+	t = inner & (me >> 1); t |= inner & (t >> 1); p = inner & (inner >> 1); t |= p & (t >> 2); t |= p & (t >> 2)
+	moves |= t >> 1
+
+	# vertical
+	t = opp & (me << 8); t |= opp & (t << 8); p = opp & (opp << 8); t |= p & (t << 16); t |= p & (t << 16)
+	moves |= t << 8
+	t = opp & (me >> 8); t |= opp & (t >> 8); p = opp & (opp >> 8); t |= p & (t >> 16); t |= p & (t >> 16)
+	moves |= t >> 8
+
+	# diagonals
+	t = inner & (me << 9); t |= inner & (t << 9); p = inner & (inner << 9); t |= p & (t << 18); t |= p & (t << 18)
+	moves |= t << 9
+	t = inner & (me >> 9); t |= inner & (t >> 9); p = inner & (inner >> 9); t |= p & (t >> 18); t |= p & (t >> 18)
+	moves |= t >> 9
+	t = inner & (me << 7); t |= inner & (t << 7); p = inner & (inner << 7); t |= p & (t << 14); t |= p & (t << 14)
+	moves |= t << 7
+	t = inner & (me >> 7); t |= inner & (t >> 7); p = inner & (inner >> 7); t |= p & (t >> 14); t |= p & (t >> 14)
+	moves |= t >> 7
+
+	return moves & empty
+
+# moveMask, including the setup rule for the first four rounds (only the center may be taken)
+def validMask(me, opp, round):
+	if round < 4:
+		return CENTER & ~(me | opp)
+	return moveMask(me, opp)
+
+# opponent discs flipped by playing on square sq
+def flips(me, opp, sq):
+	bit = 1 << sq
+	flipped = 0
+	for s, mask in LEFT_SHIFTS:
+		f = 0
+		x = (bit << s) & mask
+		while x & opp:
+			f |= x
+			x = (x << s) & mask
+		if x & me:
+			flipped |= f
+	for s, mask in RIGHT_SHIFTS:
+		f = 0
+		x = (bit >> s) & mask
+		while x & opp:
+			f |= x
+			x = (x >> s) & mask
+		if x & me:
+			flipped |= f
+	return flipped
+
+# discs of b with at least one empty neighbour
+def frontier(b, empty):
+	return b & neighbours(empty)
+
+# for each direction, the squares that have no neighbour in that direction (the wall)
+def _walls():
+	walls = {}
+	for (dx, dy) in DIRECTIONS:
+		wall = 0
+		for i in range(8):
+			for j in range(8):
+				if not (0 <= i + dx < 8 and 0 <= j + dy < 8):
+					wall |= 1 << square(i, j)
+		walls[(dx, dy)] = wall
+	return walls
+WALLS = _walls()
+
+# spread gen toward higher (left) or lower (right) squares by s per step, through the squares of pro
+# pro must already be masked for the direction, so the fill cannot wrap around a row
+def fillLeft(gen, pro, s):
+	gen |= pro & (gen << s)
+	pro &= pro << s
+	gen |= pro & (gen << 2*s)
+	pro &= pro << 2*s
+	return gen | (pro & (gen << 4*s))
+
+def fillRight(gen, pro, s):
+	gen |= pro & (gen >> s)
+	pro &= pro >> s
+	gen |= pro & (gen >> 2*s)
+	pro &= pro >> 2*s
+	return gen | (pro & (gen >> 4*s))
+
+# the squares of b from which we can travel in direction (dx, dy) to the wall through b only
+def runToWall(b, dx, dy):
+	s, mask = DIRECTIONS[(-dx, -dy)]
+	if s > 0:
+		return fillLeft(b & WALLS[(dx, dy)], b & mask, s)
+	return fillRight(b & WALLS[(dx, dy)], b & mask, -s)
+
+AXES = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+# for each of the four line directions, the squares whose whole line in that direction is filled
+def fullLines(filled):
+	return [runToWall(filled, dx, dy) & runToWall(filled, -dx, -dy) for (dx, dy) in AXES]
@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 import sys
-import socket
 import time
 import json
 from random import randint
@@ -9,43 +8,17 @@ from random import randint
 from SmartAI import SmartAI
 from RandomAI import RandomAI
 from NewAI import NewAI
-
-END_TURN = -999
+from OpeningBook import OpeningBook
+from match import createAI
+from protocol import END_TURN, Overhead, connect
 
 state = [[0 for x in range(8)] for y in range(8)]
 
 # establish a connection with the server
-def initClient(me, host):
-	sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
-	server_address = (host, 3333 + me)
-	print >> sys.stderr, 'starting up on %s port %s' % server_address
-	sock.connect(server_address)
-
-	info = sock.recv(1024)
-
-	return sock
-
-# read a message from the server
-def readMessage(sock):
-	message = sock.recv(1024).split('\n')
-
-	turn = int(message[0]) # update turn
-
-	if turn == END_TURN:
-		return (turn, -1, -1, -1)
-
-	round = int(message[1]) # update round
-	t1 = float(message[2]) # update amount of time available to player 1
-	t2 = float(message[3]) # update amount of time available to player 2
-
-	count = 4
-	for i in range(8):
-		for j in range(8):
-			state[i][j] = int(message[count])
-			count += 1
-
-	return (turn, round, t1, t2)
+def initClient(me, host, port=3333):
+	print >> sys.stderr, 'starting up on %s port %s' % (host, port + me)
+	(connection, minutes) = connect(me, host, port)
+	return connection
 
 def winner(state):
 	score = 0
@@ -61,30 +34,63 @@ def winner(state):
 		return 2
 	return 0
 
+# the book's move for this player, if the position is in the book (and the move is valid there)
+def bookMove(book, AI, me, round):
+	move = book.move(state, me)
+	if move is None or move not in AI.getValidMoves(AI.fromState(state), round, me):
+		return None
+	print 'Book move'
+	return move
+
 # establish a connection with the server and play whenever it is this player's turn
-def playGame(me, host, AI):
-	sock = initClient(me, host)
+# with ponder, the AI thinks about the position after each of our moves while we wait for the opponent's
+# with a book (an OpeningBook), positions in it are played from the book without searching
+def playGame(me, host, AI, ponder=False, book=None, port=3333):
+	connection = initClient(me, host, port)
+	overhead = Overhead(me)
 	turn = 0
+	moved = False
 	while (turn != END_TURN):
-		(turn, round, t1, t2) = readMessage(sock)
+		(turn, round, t1, t2) = connection.readMessage(state)
+		if ponder:
+			AI.stopPondering()
+		if turn != END_TURN:
+			overhead.charged(t1, t2)
 		if (turn == me):
-			myMove = AI.move(turn=turn, round=round, state=state, t1=t1, t2=t2)
+			myMove = None
+			if book is not None:
+				myMove = bookMove(book, AI, me, round)
+			# only ponder after searched moves, which leave the AI knowing what it expects next
+			moved = myMove is None
+			if myMove is None:
+				(myT1, myT2) = overhead.adjust(round, t1, t2, connection.received)
+				myMove = AI.move(turn=turn, round=round, state=state, t1=myT1, t2=myT2)
 			print myMove
-			sock.send(str(myMove[0]) + '\n' + str(myMove[1]) + '\n')
+			connection.sendMove(myMove)
+			overhead.moved(t1 if me == 1 else t2, connection.received, connection.sent)
+		elif turn != END_TURN and moved and ponder:
+			# the server's update after our move: the opponent is thinking now
+			AI.startPondering([row[:] for row in state], round)
+			moved = False
 	time.sleep(1)
+	connection.close()
 	return winner(state)
 
-# call: python client.py [ipaddress] [player_number] [AIType]
+# call: python client.py [ipaddress] [player_number] [AIType] [port]
 #   ipaddress is the ipaddress on the computer the server was launched on.  Enter 'localhost' if it is on the same computer
 #   player_number is 1 (for the black player) and 2 (for the white player)
 #	AIType is the type of AI to use (smart or random)
+#   port is the server's base port: players connect to port + player_number (3333 by default; see Server/server.py)
 if __name__ == '__main__':
 	me = int(sys.argv[2])
 	host = sys.argv[1]
 	AIType = ''
 	if len(sys.argv) > 3:
 		AIType = sys.argv[3]
+	port = int(sys.argv[4]) if len(sys.argv) > 4 else 3333
 
+	ponder = False
+	book = None
 	if AIType == 'smart':
 		AI = SmartAI(me)
 	elif AIType == 'random':
@@ -98,14 +104,13 @@ if __name__ == '__main__':
 			print 'No AI type specified'
 			print config
 			sys.exit(-999)
-		if config['ai'] == 'smart':
-			AI = SmartAI(me, config)
-		elif config['ai'] == 'random':
-			AI = RandomAI(me, config)
-		elif config['ai'] == 'new':
-			AI = NewAI(me, config)
-		else:
+		ponder = config.get('ponder', False)
+		if 'book' in config:
+			book = OpeningBook(config['book'])
+		try:
+			AI = createAI(me, config)
+		except ValueError:
 			print 'Unknown AI type'
 			sys.exit(-999)
 
-	sys.exit(playGame(me, host, AI))
+	sys.exit(playGame(me, host, AI, ponder, book, port))
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import struct
+import sys
+import time
+
+from match import playGame, poolable
+import symmetry
+
+# dataset file: MAGIC, then one record per position, appended as games finish (so several runs can add to one file):
+#   black, white: bitboards of each player's discs, in the position's canonical orientation (see symmetry.canonical)
+#   player: the player to move
+#   round
+#   score: the game's final disc difference, black's minus white's (with the empty squares going to the winner)
+MAGIC = 'RVDATA01'
+RECORD = struct.Struct('<QQBBb')
+
+# the records of a game's positions, (black, white, player, round) as match.playGame lists them, with its final score
+def pack(positions, score):
+	records = []
+	for (black, white, player, round) in positions:
+		(canon, t) = symmetry.canonical([0, black, white])
+		records.append(RECORD.pack(canon[1], canon[2], player, round, score))
+	return ''.join(records)
+
+# pool worker: one self-play game; job is (configs for players 1 and 2, minutes, randomPlies, seed)
+# returns the game's packed records, or '' if it was not played out (a player ran out of time or played an invalid move)
+def _playGame(job):
+	(configs, minutes, randomPlies, seed) = job
+	random.seed(seed)
+	stdout = sys.stdout
+	sys.stdout = open(os.devnull, 'w')
+	try:
+		positions = []
+		(winner, black, white, blackTime, whiteTime, reason) = playGame(configs, minutes, positions, randomPlies)
+	finally:
+		sys.stdout.close()
+		sys.stdout = stdout
+	if reason != 'moves':
+		return ''
+	return pack(positions, black - white)
+
+# play games between two player configs, one and two, swapping colours every game, and append their positions
+# to the dataset at path; the games run in workers processes (one per core by default), or here one at a time
+# if a player has workers of its own (see match.poolable)
+# returns the number of positions written
+def generate(path, one, two, games, minutes, randomPlies, workers=None):
+	if workers is None:
+		workers = multiprocessing.cpu_count()
+	seed = random.SystemRandom().getrandbits(32)
+	jobs = [((one, two) if game % 2 == 0 else (two, one), minutes, randomPlies, seed + game) for game in range(games)]
+	count = 0
+	with open(path, 'ab') as file:
+		if file.tell() == 0:
+			file.write(MAGIC)
+		pool = None
+		results = itertools.imap(_playGame, jobs)
+		if workers > 1 and poolable((one, two)):
+			pool = multiprocessing.Pool(workers)
+			results = pool.imap_unordered(_playGame, jobs)
+		try:
+			for data in results:
+				file.write(data)
+				file.flush()
+				count += len(data) // RECORD.size
+		finally:
+			if pool is not None:
+				pool.terminate()
+	return count
+
+# the dataset at path as a read-only numpy record array, mapped from the file rather than read into memory,
+# with fields black, white (uint64), player, round (uint8) and score (int8)
+def load(path):
+	# numpy is only needed to read datasets
+	import numpy
+	dtype = numpy.dtype([('black', '<u8'), ('white', '<u8'), ('player', 'u1'), ('round', 'u1'), ('score', 'i1')])
+	with open(path, 'rb') as file:
+		if file.read(len(MAGIC)) != MAGIC:
+			raise ValueError('Not a dataset: %s' % path)
+	return numpy.memmap(path, dtype=dtype, mode='r', offset=len(MAGIC))
+
+# call: python dataset.py [path] [player_one] [player_two] [games] [minutes] [randomPlies] [workers]
+#   appends the positions of self-play games between two configs from config/player to the dataset at path
+if __name__ == '__main__':
+	if len(sys.argv) < 4:
+		print 'USAGE: python dataset.py [path] [player_one] [player_two] [games] [minutes] [randomPlies] [workers]'
+		sys.exit()
+
+	path = sys.argv[1]
+	with open('../config/player/%s.json' % sys.argv[2]) as file:
+		one = json.load(file)
+	with open('../config/player/%s.json' % sys.argv[3]) as file:
+		two = json.load(file)
+	games = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+	minutes = float(sys.argv[5]) if len(sys.argv) > 5 else 0.5
+	randomPlies = int(sys.argv[6]) if len(sys.argv) > 6 else 8
+	workers = int(sys.argv[7]) if len(sys.argv) > 7 else None
+
+	start = time.time()
+	count = generate(path, one, two, games, minutes, randomPlies, workers)
+	print 'Wrote %d positions from %d games to %s in %.1f seconds' % (count, games, path, time.time() - start)
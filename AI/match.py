@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+import multiprocessing
+import os
+import random
+import sys
+import time
+import traceback
+
+from SmartAI import SmartAI
+from RandomAI import RandomAI
+from NewAI import NewAI
+from OpeningBook import OpeningBook
+import bitboard
+
+# the AI for a player config (a config/player json), as client.py builds it
+def createAI(me, config):
+	if not 'ai' in config:
+		raise ValueError('No AI type specified')
+	if config['ai'] == 'smart':
+		return SmartAI(me, config)
+	elif config['ai'] == 'random':
+		return RandomAI(me, config)
+	elif config['ai'] == 'new':
+		return NewAI(me, config)
+	elif config['ai'] == 'pattern':
+		# SmartAI's search with pattern tables for its evaluation
+		if not 'patterns' in config:
+			raise ValueError('No pattern file specified')
+		return SmartAI(me, config)
+	raise ValueError('Unknown AI type: %s' % config['ai'])
+
+# an in-process referee for one game, with the server's rules (see Server/Reversi.java):
+#   each player has minutes on their clock, and the wall time of every move comes off it
+#   a player whose clock runs out loses, as does one that plays an invalid move (the server would ask again,
+#   but an AI asked the same question gives the same answer)
+#   a player with no valid moves passes; the game ends when both pass, and the empty squares go to the winner
+# the first randomPlies moves are random rather than the AIs' (for varied games), and with a positions list,
+# (black discs, white discs, player, round) is added to it for every position a player moves in
+# returns (winner, black discs, white discs, black time left, white time left, reason), winner 0 for a draw
+def playGame(configs, minutes, positions=None, randomPlies=0):
+	ais = [None, createAI(1, configs[0]), createAI(2, configs[1])]
+	books = [None] + [OpeningBook(config['book']) if 'book' in config else None for config in configs]
+	times = [0.0, minutes * 60.0, minutes * 60.0]
+	board = bitboard.fromState([[0 for y in range(8)] for x in range(8)])
+	player = 1
+	round = 0
+	passes = 0
+	winner = None
+	reason = 'moves'
+	while passes < 2:
+		moves = bitboard.validMask(board[player], board[3-player], round)
+		if moves == 0:
+			passes += 1
+			player = 3-player
+			continue
+		passes = 0
+
+		if positions is not None:
+			positions.append((board[1], board[2], player, round))
+		state = bitboard.toState(board)
+		start = time.time()
+		move = None
+		if round < randomPlies:
+			sq = random.choice(list(bitboard.squares(moves)))
+			move = [sq >> 3, sq & 7]
+		elif books[player] is not None:
+			move = books[player].move(state, player)
+		if move is None or not (moves >> (move[0]*8 + move[1])) & 1:
+			move = ais[player].move(turn=player, round=round, state=state, t1=times[1], t2=times[2])
+		times[player] -= time.time() - start
+
+		if times[player] <= 0.0:
+			(winner, reason) = (3-player, 'time')
+			break
+		if move is None or not (0 <= move[0] < 8 and 0 <= move[1] < 8) or not (moves >> (move[0]*8 + move[1])) & 1:
+			(winner, reason) = (3-player, 'invalid move %s' % (move,))
+			break
+
+		sq = bitboard.square(move[0], move[1])
+		flipped = bitboard.flips(board[player], board[3-player], sq)
+		board[player] |= flipped | (1 << sq)
+		board[3-player] &= ~flipped
+		player = 3-player
+		round += 1
+
+	for book in books[1:]:
+		if book is not None:
+			book.close()
+
+	discs = [0, bitboard.popcount(board[1]), bitboard.popcount(board[2])]
+	if winner is not None:
+		# the loser's discs are taken off the board
+		discs[3-winner] = 0
+		times[3-winner] = 0.0
+	else:
+		winner = 0
+		if discs[1] != discs[2]:
+			winner = 1 if discs[1] > discs[2] else 2
+			discs[winner] = 64 - discs[3-winner]
+	return (winner, discs[1], discs[2], times[1], times[2], reason)
+
+# pool worker: one game of a match, with the AIs' output thrown away
+# job is (game, configs for players 1 and 2, minutes, seed); returns (game, result of playGame, or None, error)
+def _playGame(job):
+	(game, configs, minutes, seed) = job
+	random.seed(seed)
+	stdout = sys.stdout
+	sys.stdout = open(os.devnull, 'w')
+	try:
+		return (game, playGame(configs, minutes), None)
+	except Exception:
+		return (game, None, traceback.format_exc())
+	finally:
+		sys.stdout.close()
+		sys.stdout = stdout
+
+# whether games between player configs can run in pool processes: those are daemonic, so they cannot start
+# the worker pools of AIs with workers of their own
+def poolable(configs):
+	return all([config.get('workers', 0) <= 1 for config in configs])
+
+# play games between two player configs, one and two, swapping colours every game (one is black in even games)
+# with workers > 1 the games run in that many processes, unless an AI has workers of its own (see poolable), when they
+# run here one at a time; no more than one per core, since AIs budget by their own cpu time but the clock runs on wall time
+# yields (game, one's colour, result of playGame or None, error) as games finish, in no particular order
+def playMatch(one, two, games, minutes, workers=1):
+	seed = random.SystemRandom().getrandbits(32)
+	jobs = [(game, (one, two) if game % 2 == 0 else (two, one), minutes, seed + game) for game in range(games)]
+	if workers > 1 and poolable((one, two)):
+		pool = multiprocessing.Pool(workers)
+		try:
+			for (game, result, error) in pool.imap_unordered(_playGame, jobs):
+				yield (game, 1 + game % 2, result, error)
+		finally:
+			pool.terminate()
+	else:
+		for job in jobs:
+			(game, result, error) = _playGame(job)
+			yield (game, 1 + game % 2, result, error)
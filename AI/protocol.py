@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+import socket
+import time
+
+END_TURN = -999
+
+TOTAL_MOVES = 64
+
+# a connection to the server, which sends newline separated values (see Server/Player.java) that can arrive split
+# across any number of reads, or with several messages in one; lines are framed from a buffer, however they arrive
+class Connection(object):
+	def __init__(self, sock, size=4096):
+		self.sock = sock
+		self.size = size
+		self.buffer = ''
+		self.position = 0 # start of the unread part of the buffer
+		self.arrived = 0.0 # when the first unread byte was received (by time.time)
+		self.received = 0.0 # when the first byte of the last message read was received
+		self.sent = 0.0 # when the last move was sent
+
+	# the next line, without its newline; raises EOFError if the server closes the connection first
+	def readLine(self):
+		end = self.buffer.find('\n', self.position)
+		while end == -1:
+			data = self.sock.recv(self.size)
+			if not data:
+				raise EOFError('The server closed the connection')
+			if self.position == len(self.buffer):
+				self.arrived = time.time()
+			# drop what has been read, so the buffer only ever holds about one message
+			searched = len(self.buffer) - self.position
+			self.buffer = self.buffer[self.position:] + data
+			self.position = 0
+			end = self.buffer.find('\n', searched)
+		line = self.buffer[self.position:end]
+		self.position = end + 1
+		return line
+
+	# the first non-blank line (every message ends with a blank line), with self.received set to when it arrived
+	def startMessage(self):
+		line = self.readLine()
+		while not line.strip():
+			line = self.readLine()
+		self.received = self.arrived
+		return line
+
+	# the server's first message, 'me minutes': returns (me, minutes)
+	def readInfo(self):
+		fields = self.startMessage().split()
+		return (int(fields[0]), float(fields[1]))
+
+	# a turn or update message: returns (turn, round, t1, t2), with the board parsed into state (a list of 8 lists
+	# of 8, overwritten in place); a game over message only has the turn, END_TURN, and returns (END_TURN, -1, -1, -1)
+	def readMessage(self, state):
+		turn = int(self.startMessage())
+		if turn == END_TURN:
+			return (turn, -1, -1, -1)
+
+		round = int(self.readLine())
+		t1 = float(self.readLine())
+		t2 = float(self.readLine())
+		readLine = self.readLine
+		for row in state:
+			for j in range(8):
+				row[j] = int(readLine())
+		return (turn, round, t1, t2)
+
+	def sendMove(self, move):
+		self.sock.sendall('%d\n%d\n' % (move[0], move[1]))
+		self.sent = time.time()
+
+	def close(self):
+		self.sock.close()
+
+# connect to the server for player me (on port + me) and read its first message;
+# returns the Connection and the game's minutes
+def connect(me, host, port=3333):
+	sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+	sock.connect((host, port + me))
+	connection = Connection(sock)
+	(me, minutes) = connection.readInfo()
+	return (connection, minutes)
+
+# the time the server takes off our clock for a move beyond what we measure from receiving its message to sending
+# ours (the network both ways and the server's own pauses), averaged over our moves, so the AI can be told what it
+# really has: the clock, less the time since the message arrived and this overhead for each of our remaining moves
+class Overhead(object):
+	def __init__(self, me):
+		self.me = me
+		self.overhead = 0.0
+		self.moves = 0
+		self.pending = None # (our time left before the move, seconds we measured for it) until the server charges it
+
+	# we have sent a move, having had timeLeft when the message asking for it arrived
+	def moved(self, timeLeft, received, sent):
+		self.pending = (timeLeft, sent - received)
+
+	# the server's next message after a move gives our time left once the move was charged
+	def charged(self, t1, t2):
+		if self.pending is None:
+			return
+		(before, measured) = self.pending
+		self.pending = None
+		extra = max(before - (t1 if self.me == 1 else t2) - measured, 0.0)
+		self.moves += 1
+		self.overhead += (extra - self.overhead) / self.moves
+
+	# (t1, t2) to give the AI for a message with the given clocks that arrived at received (by time.time)
+	def adjust(self, round, t1, t2, received):
+		myRemainingMoves = (TOTAL_MOVES - round + 1) / 2
+		reserve = time.time() - received + self.overhead * myRemainingMoves
+		if self.me == 1:
+			return (max(t1 - reserve, 0.0), t2)
+		return (t1, max(t2 - reserve, 0.0))
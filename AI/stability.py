@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import bitboard
+
+# stable discs: discs that can never be flipped, whatever either player plays for the rest of the game
+# a disc can only be flipped along one of the four lines through it, and cannot be along a line when either
+#   A) the line is full (nothing can ever be played on it), or
+#   B) one of its neighbours on the line is the wall or a stable disc of its own colour
+#      (a flip along the line would have to flip that neighbour too)
+# the edges are looked up in a table that is exact for a line on its own, and stability then spreads
+# from the edge discs (and the full lines) to every disc that has A or B on all four lines
+
+# flips along a line of 8 squares (bits of a byte) when me takes square x
+def _lineFlips(me, opp, x):
+	flipped = 0
+	for step in (1, -1):
+		run = 0
+		y = x + step
+		while 0 <= y < 8 and (opp >> y) & 1:
+			run |= 1 << y
+			y += step
+		if 0 <= y < 8 and (me >> y) & 1:
+			flipped |= run
+	return flipped
+
+# EDGE[a | b << 8] is the mask of the discs (of either player) of a line of 8 squares, with a and b the bytes of
+# each player's discs, that no sequence of moves on the line can flip
+# any empty square may be taken by either player at any time (on the board a move can be valid through another
+# line), so a disc is stable when it keeps its colour and stays stable after every move on the line
+def _edgeTable():
+	table = [0] * 65536
+	positions = [(a, b) for a in range(256) for b in range(256) if not a & b]
+	# fuller lines first, so that every position a move leads to is done before the position itself
+	positions.sort(key=lambda position: -bitboard.popcount(position[0] | position[1]))
+	for (a, b) in positions:
+		stable = a | b
+		empty = ~stable & 0xFF
+		for x in range(8):
+			if not (empty >> x) & 1 or not stable:
+				continue
+			flipped = _lineFlips(a, b, x)
+			stable &= table[(a | flipped | (1 << x)) | (b & ~flipped) << 8] & ~flipped
+			flipped = _lineFlips(b, a, x)
+			stable &= table[(a & ~flipped) | (b | flipped | (1 << x)) << 8] & ~flipped
+		table[a | b << 8] = stable
+	return table
+EDGE = _edgeTable()
+
+# the first column of a board, gathered into a byte by a multiplication (which cannot carry into the top byte)
+COL_0 = 0x0101010101010101
+COLUMN_MAGIC = 0x0102040810204080
+def columnByte(b):
+	return (((b & COL_0) * COLUMN_MAGIC) >> 56) & 0xFF
+
+# COLUMN[columnByte(b)] == b & COL_0: a byte scattered back onto the first column
+def _columns():
+	columns = [0] * 256
+	for byte in range(256):
+		for row in range(8):
+			if columnByte(1 << (row*8)) & byte:
+				columns[byte] |= 1 << (row*8)
+	return columns
+COLUMN = _columns()
+
+# the edge discs of a board that are stable, from the four edges' table entries
+def edges(a, b):
+	result = EDGE[(a & 0xFF) | (b & 0xFF) << 8] | EDGE[(a >> 56) | (b >> 56) << 8] << 56
+	result |= COLUMN[EDGE[columnByte(a) | columnByte(b) << 8]]
+	result |= COLUMN[EDGE[columnByte(a >> 7) | columnByte(b >> 7) << 8]] << 7
+	return result
+
+# for each of bitboard.AXES: ((shift, mask) toward each of the line's two directions, the squares at either end)
+# shifting a set of squares by -d gives the squares whose neighbour in direction d is in the set
+ANCHORS = [(bitboard.DIRECTIONS[(-dx, -dy)], bitboard.DIRECTIONS[(dx, dy)], bitboard.WALLS[(dx, dy)] | bitboard.WALLS[(-dx, -dy)])
+	for (dx, dy) in bitboard.AXES]
+
+# own's discs that are stable, given the stable discs found so far and the full lines (see bitboard.fullLines)
+def expand(own, stable, full):
+	stable &= own
+	candidates = own & ~stable
+	while candidates:
+		new = candidates
+		for i in range(4):
+			((s1, mask1), (s2, mask2), walls) = ANCHORS[i]
+			new &= full[i] | walls | bitboard.shift(stable, s1, mask1) | bitboard.shift(stable, s2, mask2)
+			if not new:
+				return stable
+		stable |= new
+		candidates ^= new
+	return stable
+
+# the stable discs of both players, for the discs a and b of each
+def stable(a, b):
+	full = bitboard.fullLines(a | b)
+	seeds = edges(a, b)
+	return expand(a, seeds, full) | expand(b, seeds, full)
+
+# (my stable discs, the opponent's stable discs), as counts
+def counts(me, opp):
+	discs = stable(me, opp)
+	return (bitboard.popcount(discs & me), bitboard.popcount(discs & opp))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import struct
+
+import bitboard
+
+# the 8 symmetries of the board, numbered by what they do to a square (row, col), in this order:
+#   4: swap row and col (transpose)
+#   1: col -> 7 - col (mirror)
+#   2: row -> 7 - row (flip)
+# so 0 is the identity, 3 is a half turn, 5 and 6 are quarter turns and 7 is the other diagonal
+TRANSFORMS = range(8)
+
+def transformSquare(sq, t):
+	row = sq >> 3
+	col = sq & 7
+	if t & 4:
+		(row, col) = (col, row)
+	if t & 1:
+		col = 7 - col
+	if t & 2:
+		row = 7 - row
+	return row*8 + col
+
+SQUARES = [[transformSquare(sq, t) for sq in range(64)] for t in TRANSFORMS]
+# the transform that undoes each transform
+INVERSE = [[u for u in TRANSFORMS if SQUARES[u][SQUARES[t][1]] == 1 and SQUARES[u][SQUARES[t][8]] == 8][0] for t in TRANSFORMS]
+
+def mirror(b):
+	b = ((b >> 1) & 0x5555555555555555) | ((b & 0x5555555555555555) << 1)
+	b = ((b >> 2) & 0x3333333333333333) | ((b & 0x3333333333333333) << 2)
+	return ((b >> 4) & 0x0F0F0F0F0F0F0F0F) | ((b & 0x0F0F0F0F0F0F0F0F) << 4)
+
+def flip(b):
+	return struct.unpack('<Q', struct.pack('>Q', b))[0]
+
+def transpose(b):
+	t = 0x0F0F0F0F00000000 & (b ^ (b << 28))
+	b ^= t ^ (t >> 28)
+	t = 0x3333000033330000 & (b ^ (b << 14))
+	b ^= t ^ (t >> 14)
+	t = 0x5500550055005500 & (b ^ (b << 7))
+	return b ^ t ^ (t >> 7)
+
+# apply a transform to a bitboard (a single 64-bit integer)
+def transformBits(b, t):
+	if t & 4:
+		b = transpose(b)
+	if t & 1:
+		b = mirror(b)
+	if t & 2:
+		b = flip(b)
+	return b
+
+# apply a transform to a board (list-of-lists state or bitboard), returning the same kind of board
+def transform(state, t):
+	if len(state) != 3:
+		return bitboard.toState(transform(bitboard.fromState(state), t))
+	return [0, transformBits(state[1], t), transformBits(state[2], t)]
+
+# (canonical board, transform) for a board (list-of-lists state or bitboard): the canonical board is the smallest
+# of the board's 8 images (as a bitboard, compared player 1 first), and is transform(board, transform)
+def canonical(state):
+	board = state if len(state) == 3 else bitboard.fromState(state)
+	best = None
+	bestTransform = 0
+	for t in TRANSFORMS:
+		image = (transformBits(board[1], t), transformBits(board[2], t))
+		if best is None or image < best:
+			best = image
+			bestTransform = t
+	canon = [0, best[0], best[1]]
+	if len(state) != 3:
+		canon = bitboard.toState(canon)
+	return (canon, bestTransform)
+
+# a [row, col] move through a transform, and back
+def transformMove(move, t):
+	sq = SQUARES[t][move[0]*8 + move[1]]
+	return [sq >> 3, sq & 7]
+
+def untransformMove(move, t):
+	return transformMove(move, INVERSE[t])
+
+# the transforms other than the identity that leave a board (list-of-lists state or bitboard) unchanged
+def symmetries(state):
+	board = state if len(state) == 3 else bitboard.fromState(state)
+	return [t for t in TRANSFORMS[1:] if transformBits(board[1], t) == board[1] and transformBits(board[2], t) == board[2]]
+
+# [row, col] moves with one move kept from each set that a symmetry of the board makes equivalent
+# (the moves in the lowest square of the set), in their original order
+def uniqueMoves(state, moves):
+	found = symmetries(state)
+	if len(found) == 0:
+		return moves
+	unique = []
+	for move in moves:
+		sq = move[0]*8 + move[1]
+		if min([SQUARES[t][sq] for t in found]) >= sq:
+			unique.append(move)
+	return unique
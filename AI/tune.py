@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+import json
+import sys
+import time
+
+import numpy
+
+from BatchEvaluator import unpack, neighbours, popcount, moveMask, stable, ratio
+from SmartAI import SmartAI
+import dataset
+
+TOTAL_MOVES = 64
+
+# SmartAI's heuristic only counts discs for the last pivotTurn moves, so those positions say nothing about the weights
+PIVOT_TURN = 10
+
+CLASSES = 'rcxabmt'
+
+# positions whose features are computed at once (the unpacked boards take 1 kB each)
+CHUNK = 100000
+
+# which class each square belongs to, as a (64, classes) 0/1 matrix
+CLASS_MATRIX = numpy.array([[(mask >> sq) & 1 for mask in SmartAI(1).classMasks] for sq in range(64)], dtype=numpy.int64)
+
+# SmartAI.bitboardHeuristic's terms for the side to move, as a (positions, 10) array: how many more squares of each
+# square class (in CLASSES order) it holds, then the frontier, mobility and stability ratios
+# (without the bonus for the square the last move was played on, which a position alone does not have)
+# positions are past the opening's first 4 moves, where mobility is counted differently
+def features(mine, theirs):
+	counts = (unpack(mine) - unpack(theirs)).dot(CLASS_MATRIX)
+
+	empty = ~(mine | theirs)
+	open = neighbours(empty)
+	frontierScore = ratio(popcount(theirs & open), popcount(mine & open))
+
+	mobilityScore = ratio(popcount(moveMask(mine, theirs)), popcount(moveMask(theirs, mine)))
+
+	discs = stable(mine, theirs)
+	stabilityScore = ratio(popcount(discs & mine), popcount(discs & theirs))
+
+	return numpy.column_stack([counts, frontierScore, mobilityScore, stabilityScore])
+
+# (features, results) for the positions of a dataset (see dataset.load) that the heuristic scores,
+# with each game's result for the side to move: 1 for a win, 0.5 for a draw, 0 for a loss
+def samples(records):
+	records = records[(records['round'] >= 4) & (TOTAL_MOVES - records['round'].astype(numpy.int64) >= PIVOT_TURN)]
+	x = []
+	y = []
+	for start in range(0, len(records), CHUNK):
+		chunk = records[start:start + CHUNK]
+		black = chunk['player'] == 1
+		mine = numpy.where(black, chunk['black'], chunk['white'])
+		theirs = numpy.where(black, chunk['white'], chunk['black'])
+		x.append(features(mine, theirs))
+		score = numpy.where(black, chunk['score'], -chunk['score'].astype(numpy.int64))
+		y.append(numpy.where(score > 0, 1.0, numpy.where(score < 0, 0.0, 0.5)))
+	return (numpy.concatenate(x), numpy.concatenate(y))
+
+def sigmoid(v):
+	return 1.0 / (1.0 + numpy.exp(-v))
+
+# coefficients w for the win probability sigmoid(x.dot(w)), fitted to the results y by logistic regression
+# (Newton's method, which takes a few passes over the data rather than thousands), with a little l2 regularization
+def fit(x, y, l2=1e-4, iterations=50):
+	w = numpy.zeros(x.shape[1])
+	for i in range(iterations):
+		p = sigmoid(x.dot(w))
+		gradient = x.T.dot(p - y) / len(y) + l2 * w
+		hessian = (x * (p * (1 - p))[:, None]).T.dot(x) / len(y) + l2 * numpy.eye(len(w))
+		step = numpy.linalg.solve(hessian, gradient)
+		w -= step
+		if numpy.abs(step).max() < 1e-9:
+			break
+	return w
+
+# mean squared error of the predicted win probabilities, the usual measure of how well an evaluation fits results
+def error(x, w, y):
+	return ((sigmoid(x.dot(w)) - y) ** 2).mean()
+
+# a config's heuristic as coefficients on the features: the terms are divided by the sum of their weights
+def coefficients(config):
+	weights = [config[term] for term in ['positionalWeight', 'frontierWeight', 'mobilityWeight', 'stabilityWeight']]
+	total = sum(weights)
+	return numpy.array([weights[0] * config[letter] / total for letter in CLASSES] + [weight / total for weight in weights[1:]])
+
+# the weights and square values giving a heuristic proportional to the coefficients g, keeping the base config's
+# positional weight and the size of its largest square value (the heuristic's scale does not change the search)
+def toConfig(g, base):
+	positionalWeight = base['positionalWeight']
+	scale = max([abs(base[letter]) for letter in CLASSES]) * positionalWeight / numpy.abs(g[:len(CLASSES)]).max()
+	config = {'positionalWeight': positionalWeight}
+	for i in range(len(CLASSES)):
+		config[CLASSES[i]] = round(float(g[i] * scale / positionalWeight), 4)
+	for (term, c) in zip(['frontierWeight', 'mobilityWeight', 'stabilityWeight'], g[len(CLASSES):]):
+		config[term] = round(float(c * scale), 4)
+	if positionalWeight + config['frontierWeight'] + config['mobilityWeight'] + config['stabilityWeight'] <= 0:
+		raise ValueError('The fitted coefficients cannot be written as weights with a positive sum')
+	return config
+
+# fit the weights of base (a player config) to the positions of the dataset at path; returns the tuned config
+def tune(path, base):
+	start = time.time()
+	(x, y) = samples(dataset.load(path))
+	print 'Computed the features of %d positions in %.1f seconds' % (len(y), time.time() - start)
+
+	# the base weights, with only the scale that turns their heuristic into a probability fitted
+	c = coefficients(base)
+	k = fit(x.dot(c)[:, None], y)[0]
+	print 'Base weights: error %f' % error(x, c * k, y)
+
+	g = fit(x, y)
+	print 'Fitted weights: error %f (%.1f seconds)' % (error(x, g, y), time.time() - start)
+
+	config = dict(base)
+	config.update(toConfig(g, base))
+	return config
+
+# call: python tune.py [dataset] [output] [base]
+#   fits the heuristic weights of the base player config (std_bitboard by default, with SmartAI's defaults for the
+#   weights it leaves out) to the positions in a dataset (see dataset.py), and writes the result as a player config
+if __name__ == '__main__':
+	if len(sys.argv) < 3:
+		print 'USAGE: python tune.py [dataset] [output] [base]'
+		sys.exit()
+
+	with open('../config/player/%s.json' % (sys.argv[3] if len(sys.argv) > 3 else 'std_bitboard')) as file:
+		base = json.load(file)
+	defaults = SmartAI(1, base).config
+	for key in ['positionalWeight', 'frontierWeight', 'mobilityWeight', 'stabilityWeight'] + list(CLASSES):
+		base.setdefault(key, defaults[key])
+
+	config = tune(sys.argv[1], base)
+	print ', '.join(['%s %s' % (key, config[key]) for key in ['positionalWeight', 'frontierWeight', 'mobilityWeight', 'stabilityWeight'] + list(CLASSES)])
+	with open(sys.argv[2], 'w') as file:
+		file.write('{\n%s\n}\n' % ',\n'.join(['\t%s: %s' % (json.dumps(key), json.dumps(config[key])) for key in sorted(config)]))
+	print 'Wrote %s' % sys.argv[2]
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+
+import asyncore
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'AI'))
+import bitboard
+
+END_TURN = -999
+
+# headless game server speaking Reversi.java's protocol (see Player.java), hosting any number of games at once:
+# game slot g listens on ports port + 2g + 1 and port + 2g + 2 for players 1 and 2 (so slot 0 has the Java server's
+# ports), plays a game whenever both are connected, and then waits for the next pair
+
+# accepts the connections of one player of one game slot
+class Listener(asyncore.dispatcher):
+	def __init__(self, game, me, port, sockets):
+		asyncore.dispatcher.__init__(self, map=sockets)
+		self.game = game
+		self.me = me
+		self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.set_reuse_addr()
+		self.bind(('', port))
+		self.listen(5)
+
+	def handle_accept(self):
+		pair = self.accept()
+		if pair is not None:
+			self.game.connected(self.me, pair[0])
+
+# one player's connection: sends are buffered, and what it sends back is split into lines for the game
+class PlayerConnection(asyncore.dispatcher_with_send):
+	def __init__(self, game, me, sock, sockets):
+		asyncore.dispatcher_with_send.__init__(self, sock, map=sockets)
+		self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		self.game = game
+		self.me = me
+		self.buffer = ''
+
+	def handle_read(self):
+		data = self.recv(4096)
+		if not data or self.game is None:
+			return
+		self.buffer += data
+		lines = self.buffer.split('\n')
+		self.buffer = lines.pop()
+		for line in lines:
+			if line.strip():
+				self.game.received(self.me, line.strip())
+
+	def handle_close(self):
+		self.close()
+		if self.game is not None:
+			self.game.disconnected(self.me)
+
+# one game slot, playing games by the Java server's rules:
+#   each player has minutes on their clock, and the time from sending a player the position to receiving its move
+#   comes off it; a player whose clock runs out loses (here as soon as it runs out, rather than once the move comes)
+#   an invalid move is asked for again, on the same clock
+#   a player with no valid moves passes; the game ends when both pass, and the empty squares go to the winner
+#   a player that disconnects during a game loses it
+class Game(object):
+	def __init__(self, slot, port, minutes, sockets, report):
+		self.slot = slot
+		self.port = port
+		self.minutes = minutes
+		self.sockets = sockets
+		self.report = report # called with (game, winner, black discs, white discs, black time, white time, reason)
+		self.players = [None, None, None]
+		self.listeners = [None, Listener(self, 1, port + 1, sockets), Listener(self, 2, port + 2, sockets)]
+		self.waiting = None # the player whose move we are waiting for, if a game is on
+		self.deadline = None
+
+	def connected(self, me, sock):
+		if self.players[me] is not None:
+			# this slot's player is already here
+			sock.close()
+			return
+		self.players[me] = PlayerConnection(self, me, sock, self.sockets)
+		self.players[me].send('%d %s\n' % (me, self.minutes))
+		if self.players[3-me] is not None:
+			self.start()
+
+	def disconnected(self, me):
+		if self.players[me] is None:
+			return
+		self.players[me] = None
+		if self.waiting is not None:
+			self.end(3-me, 'disconnected')
+
+	def start(self):
+		self.board = bitboard.fromState([[0 for y in range(8)] for x in range(8)])
+		self.times = [0.0, self.minutes * 60.0, self.minutes * 60.0]
+		self.round = 0
+		self.player = 1
+		self.reply = []
+		self.nextTurn()
+
+	# status message for a player: turn, round, clocks and the board, one value per line, then a blank line
+	def status(self, turn):
+		state = bitboard.toState(self.board)
+		return '%d\n%d\n%r\n%r\n%s\n' % (turn, self.round, self.times[1], self.times[2],
+			''.join(['%d\n' % state[i][j] for i in range(8) for j in range(8)]))
+
+	def nextTurn(self):
+		passes = 0
+		while bitboard.validMask(self.board[self.player], self.board[3-self.player], self.round) == 0:
+			passes += 1
+			if passes == 2:
+				self.end(None, 'moves')
+				return
+			self.player = 3-self.player
+		self.ask()
+
+	def ask(self):
+		self.waiting = self.player
+		self.reply = []
+		self.asked = time.time()
+		self.deadline = self.asked + self.times[self.player]
+		self.players[self.player].send(self.status(self.player))
+
+	def received(self, me, line):
+		if me != self.waiting:
+			return # not asked
+		self.reply.append(line)
+		if len(self.reply) < 2:
+			return
+		player = self.player
+		self.times[player] -= time.time() - self.asked
+		if self.times[player] <= 0.0:
+			self.end(3-player, 'time')
+			return
+
+		try:
+			(row, col) = (int(self.reply[0]), int(self.reply[1]))
+		except ValueError:
+			(row, col) = (-1, -1)
+		moves = bitboard.validMask(self.board[player], self.board[3-player], self.round)
+		if not (0 <= row < 8 and 0 <= col < 8) or not (moves >> (row*8 + col)) & 1:
+			# ask again, with what is left of the clock
+			self.ask()
+			return
+
+		sq = row*8 + col
+		flipped = bitboard.flips(self.board[player], self.board[3-player], sq)
+		self.board[player] |= flipped | (1 << sq)
+		self.board[3-player] &= ~flipped
+		self.round += 1
+		for me in (1, 2):
+			self.players[me].send(self.status(1 - me))
+		self.player = 3-player
+		self.nextTurn()
+
+	# end the game for a loser's clock running out
+	def tick(self, now):
+		if self.waiting is not None and now > self.deadline:
+			self.times[self.waiting] = 0.0
+			self.end(3-self.waiting, 'time')
+
+	# end the game, with winner set if it was decided by anything but the discs, and reset the slot for the next one
+	def end(self, winner, reason):
+		self.waiting = None
+		discs = [0, bitboard.popcount(self.board[1]), bitboard.popcount(self.board[2])]
+		if winner is not None:
+			# the loser's discs are taken off the board
+			self.board[3-winner] = 0
+			discs[3-winner] = 0
+			self.times[3-winner] = max(self.times[3-winner], 0.0)
+		else:
+			winner = 0
+			if discs[1] != discs[2]:
+				winner = 1 if discs[1] > discs[2] else 2
+				# the empty squares go to the winner
+				self.board[winner] = bitboard.FULL & ~self.board[3-winner]
+				discs[winner] = 64 - discs[3-winner]
+
+		state = bitboard.toState(self.board)
+		finale = '%d\n%r\n%r\n%s\n' % (winner, self.times[1], self.times[2],
+			''.join(['%d\n' % state[i][j] for i in range(8) for j in range(8)]))
+		players = self.players
+		self.players = [None, None, None]
+		for player in players[1:]:
+			if player is not None:
+				player.send('%d\n' % END_TURN)
+				player.send(finale)
+				player.game = None
+				player.close_when_done = True
+		self.report(self, winner, discs[1], discs[2], self.times[1], self.times[2], reason)
+
+# a player connection that is only left to flush its last messages
+def _closeWhenDone(sockets):
+	for dispatcher in sockets.values():
+		if getattr(dispatcher, 'close_when_done', False) and not dispatcher.out_buffer:
+			dispatcher.close()
+
+def report(game, winner, black, white, blackTime, whiteTime, reason):
+	print 'Game on ports %d/%d: %s %d to %d (%s), time left %.1f black, %.1f white' % (game.port + 1, game.port + 2,
+		'draw' if winner == 0 else 'black wins' if winner == 1 else 'white wins', black, white, reason, blackTime, whiteTime)
+	sys.stdout.flush()
+
+# host games in slots game slots on ports from port + 1, with minutes per player, until stopped
+def serve(minutes, slots, port, tick=0.01):
+	sockets = {}
+	games = [Game(slot, port + 2*slot, minutes, sockets, report) for slot in range(slots)]
+	print 'Hosting %d games of %s minutes on ports %d to %d' % (slots, minutes, port + 1, port + 2*slots)
+	sys.stdout.flush()
+	while True:
+		asyncore.loop(timeout=tick, map=sockets, count=1)
+		now = time.time()
+		for game in games:
+			game.tick(now)
+		_closeWhenDone(sockets)
+
+# call: python server.py [minutes] [games] [port]
+#   hosts games at once, each on its own pair of ports from port + 1 (3333 by default, the Java server's)
+#   players connect with: python client.py [host] [player_number] [AIType] [port + 2 * game]
+if __name__ == '__main__':
+	if len(sys.argv) < 2:
+		print 'USAGE: python server.py [minutes] [games] [port]'
+		sys.exit()
+
+	minutes = float(sys.argv[1])
+	slots = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+	port = int(sys.argv[3]) if len(sys.argv) > 3 else 3333
+	serve(minutes if minutes != int(minutes) else int(minutes), slots, port)
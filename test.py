@@ -1,94 +1,65 @@
 #!/usr/bin/env python
 import json
+import multiprocessing
 import os
-import subprocess
 import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'AI'))
+from match import playMatch, poolable
+
+COLOURS = ['', 'black', 'white']
+
+# call: python test.py [match_settings] [player_one] [player_two] [workers]
+#   plays the match in this process (or in workers processes, one per core by default, unless a player has workers
+#   of its own) with the server's rules
+#   the players swap colours every game; player one is black in the first
 if __name__ == '__main__':
 	if len(sys.argv) < 4:
-		print 'USAGE: python test.py [match_settings] [player_one] [player_two]'
+		print 'USAGE: python test.py [match_settings] [player_one] [player_two] [workers]'
 		sys.exit()
 
 	with open('config/match/%s.json' % (sys.argv[1])) as file:
 		match_settings = json.load(file)
-	#with open('config/player/%s.json' % (sys.argv[2])) as file:
-	#	player_one = json.load(file)
-	#with open('config/player/%s.json' % (sys.argv[3])) as file:
-	#	player_two = json.load(file)
+	with open('config/player/%s.json' % (sys.argv[2])) as file:
+		player_one = json.load(file)
+	with open('config/player/%s.json' % (sys.argv[3])) as file:
+		player_two = json.load(file)
+	workers = int(sys.argv[4]) if len(sys.argv) > 4 else multiprocessing.cpu_count()
+	if workers > 1 and not poolable((player_one, player_two)):
+		print 'A player has workers of its own, so the games are played one at a time'
+
+	# player configs name files (opening books) relative to AI/, where the clients run
+	os.chdir('AI')
 
 	err = 0
 	one_wins = 0
 	two_wins = 0
-	for round in range(match_settings['rounds']):
-		print "Round %d" % (round+1)
-
-		serverp = subprocess.Popen(('java', 'Reversi', '%d' % match_settings['timelimit']), cwd='Server')
-		time.sleep(3)	# make sure the server has bound the port before anyone connects
-		onep = subprocess.Popen(('python', 'client.py', 'localhost', '1', '../config/player/%s.json'%(sys.argv[2])), cwd='AI')
-		time.sleep(1)	# don't try to connect at the same time
-		twop = subprocess.Popen(('python', 'client.py', 'localhost', '2', '../config/player/%s.json'%(sys.argv[3])), cwd='AI')
-
-		while 1:
-			time.sleep(1)
-			serverp.poll()
-			onep.poll()
-			twop.poll()
-			if serverp.returncode != None or onep.returncode != None or twop.returncode != None:
-				break
-
-		if onep.returncode != None:
-			if twop.returncode != None and onep.returncode != twop.returncode:
-				print 'Something went wrong'
-				err = 1
-			else:
-				if onep.returncode == 1:
-					print 'Player one wins'
-					one_wins += 1
-				elif onep.returncode == 2:
-					print 'Player two wins'
-					two_wins += 1
-				elif onep.returncode == 0:
-					print 'Draw'
-				else:
-					print 'Something went wrong'
-					err = 1
-		elif twop.returncode != None:
-			if twop.returncode == 1:
-				print 'Player one wins'
-				one_wins += 1
-			elif twop.returncode == 2:
-				print 'Player two wins'
-				two_wins += 1
-			elif twop.returncode == 0:
-				print 'Draw'
-			else:
-				print 'Something went wrong'
-				err = 1
-		else:
+	start = time.time()
+	for (game, one, result, error) in playMatch(player_one, player_two, match_settings['rounds'], match_settings['timelimit'], workers):
+		print "Round %d (player one is %s)" % (game+1, COLOURS[one])
+		if result is None:
 			print 'Something went wrong'
+			print error
 			err = 1
+			continue
 
-		try:
-			serverp.terminate()
-		except Exception as e:
-			pass
-		try:
-			onep.terminate()
-		except Exception as e:
-			pass
-		try:
-			twop.terminate()
-		except Exception as e:
-			pass
-
-		time.sleep(3)	# make sure the server releases the port
-
+		(winner, black, white, blackTime, whiteTime, reason) = result
+		if winner == one:
+			print 'Player one wins %d to %d (%s)' % (max(black, white), min(black, white), reason)
+			one_wins += 1
+		elif winner != 0:
+			print 'Player two wins %d to %d (%s)' % (max(black, white), min(black, white), reason)
+			two_wins += 1
+		else:
+			print 'Draw'
+		print 'Time left: %.1f black, %.1f white' % (blackTime, whiteTime)
 		print ''
-		if err:
-			break
 
+	print 'Played %d games in %.1f seconds' % (match_settings['rounds'], time.time() - start)
 	print 'Final Score: %d to %d' % (one_wins, two_wins)
+	if err:
+		print 'Some games went wrong'
 	if one_wins > two_wins:
 		print 'Player One Wins'
 	elif two_wins > one_wins: